@@ -42,12 +42,14 @@ INSTALLED_APPS = [
     'rest_framework',
     'rest_framework.authtoken',
     'core',
-    'user',
+    'user.apps.UserConfig',
     'recipe',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -131,6 +133,128 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = '/vol/web/media'
+
+# Store uploads by content hash so duplicates are only written once.
+# Django 4.2 replaced the setting with STORAGES and 5.1 ignores it, so
+# requirements.txt keeps Django below 4.2.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
 STATIC_ROOT = '/vol/web/static'
 
 AUTH_USER_MODEL = 'core.User'
+
+# API responses are rendered with orjson when it is installed, see
+# core.renderers, falling back to the standard library otherwise.
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Negotiated compression of responses, see core.middleware. Brotli is used
+# when installed and accepted, gzip otherwise. Bodies of CONTENT_TYPES
+# shorter than MIN_SIZE bytes are sent uncompressed. HTML is left out, as
+# compressing pages that carry a CSRF token exposes it to BREACH.
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'CONTENT_TYPES': ('application/json', 'application/x-ndjson'),
+}
+
+# Per-request instrumentation, see core.middleware.RequestTimingMiddleware.
+# SAMPLE_RATE is the share of requests measured. It is kept small because
+# every measured request wraps its queries and writes a log line; raise it
+# while investigating. Server-Timing headers reveal query counts, so they
+# are only sent in DEBUG. A query repeated DUPLICATE_THRESHOLD times in a
+# request is logged as a likely N+1.
+REQUEST_TIMING = {
+    'SAMPLE_RATE': 0.01,
+    'SERVER_TIMING': DEBUG,
+    'LOG': True,
+    'DUPLICATE_THRESHOLD': 10,
+}
+
+# Token lookups cached by user.authentication.CachedTokenAuthentication.
+# Set SHARED_CACHE to a CACHES alias to share entries and invalidations
+# between processes. Without it, a deleted token or deactivated user may
+# still authenticate in other processes for up to TTL seconds.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 5,
+    'SHARED_CACHE': None,
+    'SHARED_TTL': 300,
+}
+
+# Rendered recipe detail payloads, see recipe.cache. BACKEND is 'local'
+# for a per-process LRU bounded by MAX_BYTES or 'django' for CACHE_ALIAS.
+RECIPE_DETAIL_CACHE = {
+    'BACKEND': 'local',
+    'MAX_BYTES': 16 * 1024 * 1024,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Background rendering of recipe image renditions, see recipe.imaging.
+# EXECUTOR is 'process', 'thread' or 'sync'; WORKERS defaults to the CPUs.
+RECIPE_IMAGE_PIPELINE = {
+    'EXECUTOR': 'process',
+    'WORKERS': None,
+}
+
+# Limits of the streaming image upload, see recipe.uploads. Format and
+# dimensions are checked on the first HEADER_BYTES of the body.
+RECIPE_IMAGE_UPLOAD = {
+    'MAX_BYTES': 20 * 1024 * 1024,
+    'MAX_PIXELS': 50000000,
+    'HEADER_BYTES': 64 * 1024,
+    'FORMATS': ('JPEG', 'PNG', 'WEBP', 'GIF'),
+}
+
+# Full-text recipe search, see recipe.search. PostgreSQL ranks a stored
+# tsvector using CONFIG, other databases a per-user in-process index.
+RECIPE_SEARCH = {
+    'CONFIG': 'english',
+    'MAX_RESULTS': 100,
+    'INDEX_CACHE_SIZE': 256,
+}
+
+# Tag and ingredient autocompletion, see recipe.autocomplete. Users who
+# sent HOT_AFTER requests since their last change are answered from an
+# in-memory index, up to CACHE_SIZE of them, others by pg_trgm.
+RECIPE_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'THRESHOLD': 0.6,
+    'HOT_AFTER': 3,
+    'CACHE_SIZE': 64,
+}
+
+# Streaming recipe exports, see recipe.export. Recipes are read and their
+# tags and ingredients looked up CHUNK_SIZE at a time.
+RECIPE_EXPORT = {
+    'CHUNK_SIZE': 2000,
+}
+
+# Recipe stats, see recipe.stats. SUMMARY serves unfiltered stats from
+# the RecipeStat summary, kept current by signals. Changing PRICE_BUCKETS
+# requires deleting the RecipeStat rows, they are rebuilt on read.
+RECIPE_STATS = {
+    'PRICE_BUCKETS': (5, 10, 20, 50),
+    'SUMMARY': False,
+}
+
+# Recipe, tag and ingredient reads, see recipe.fastpath. ENABLED renders
+# lists and recipe details from values() rows instead of DRF serializers.
+RECIPE_FAST_READS = {
+    'ENABLED': True,
+}
+
+# Serving of MEDIA_URL, see core.views.serve_media. SENDFILE offloads the
+# body to the front server with 'x-sendfile' or 'x-accel-redirect', the
+# latter to an internal location mapping ACCEL_PREFIX to MEDIA_ROOT.
+MEDIA_SERVING = {
+    'SENDFILE': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
@@ -0,0 +1,254 @@
+import bisect
+import itertools
+import math
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from core.bulk import number_recipes
+from core.models import Tag, Ingredient, Recipe
+
+
+def seed_user(email, recipes, tags_per_recipe=3, ingredients_per_recipe=5):
+    """ Create a user owning the given number of recipes, tags and
+    ingredients, returning the user
+
+    Recipes go through bulk_create_with_relations like seed_dataset, so
+    stats, search vectors and the collection version are current.
+    """
+    user = get_user_model().objects.create_user(email)
+    attrs = max(recipes // 10, 1)
+    Tag.objects.bulk_create(
+        (Tag(user=user, name=f'Tag {i}') for i in range(attrs)),
+        batch_size=1000
+    )
+    Ingredient.objects.bulk_create(
+        (Ingredient(user=user, name=f'Ingredient {i}') for i in range(attrs)),
+        batch_size=1000
+    )
+
+    tag_ids = list(user.tag_set.values_list('id', flat=True))
+    ingredient_ids = list(user.ingredient_set.values_list('id', flat=True))
+    for start in range(0, recipes, 5000):
+        batch = [
+            Recipe(user=user, title=f'Recipe {i}', time_minute=10, price=5)
+            for i in range(start, min(start + 5000, recipes))
+        ]
+        tags = [
+            random.sample(tag_ids, min(tags_per_recipe, len(tag_ids)))
+            for _ in batch
+        ]
+        ingredients = [
+            random.sample(
+                ingredient_ids,
+                min(ingredients_per_recipe, len(ingredient_ids))
+            )
+            for _ in batch
+        ]
+        with transaction.atomic():
+            number_recipes(batch)
+            Recipe.objects.bulk_create_with_relations(
+                batch, tags, ingredients
+            )
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'ANALYZE core_tag, core_ingredient, core_recipe, '
+                'core_recipe_tags, core_recipe_ingredient'
+            )
+
+    return user
+
+
+ADJECTIVES = (
+    'Spicy', 'Creamy', 'Quick', 'Roasted', 'Smoky', 'Crispy', 'Classic',
+    'Lemon', 'Garlic', 'Sweet', 'Herby', 'Grilled', 'Rustic', 'Golden',
+)
+DISHES = (
+    'soup', 'salad', 'curry', 'stew', 'pasta', 'risotto', 'tacos', 'pie',
+    'noodles', 'bowl', 'burger', 'omelette', 'tart', 'chili', 'bake',
+)
+TAGS = (
+    'Vegetarian', 'Quick', 'Dinner', 'Vegan', 'Lunch', 'Healthy',
+    'Breakfast', 'Comfort food', 'Dessert', 'Gluten free', 'Spicy',
+    'Budget', 'Family', 'Party', 'Summer', 'Winter',
+)
+INGREDIENTS = (
+    'Salt', 'Olive oil', 'Garlic', 'Onion', 'Butter', 'Pepper', 'Lemon',
+    'Tomato', 'Flour', 'Egg', 'Milk', 'Rice', 'Chicken', 'Cheese',
+    'Carrot', 'Potato', 'Basil', 'Cumin', 'Lentils', 'Spinach',
+)
+
+
+def zipf_weights(n, exponent):
+    """ Return the cumulative weights of n ranks under Zipf's law"""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, n + 1)
+    ))
+
+
+def zipf_sample(rng, cum_weights, k):
+    """ Return up to k distinct indexes drawn with Zipfian weights"""
+    total = cum_weights[-1]
+    return list(dict.fromkeys(
+        bisect.bisect(cum_weights, rng.random() * total) for _ in range(k)
+    ))
+
+
+def recipe_counts(users, smallest, largest):
+    """ Spread collection sizes geometrically from smallest to largest,
+    so most users are small and a few are very large"""
+    if users == 1:
+        return [largest]
+    ratio = largest / smallest
+    return [
+        round(smallest * ratio ** (i / (users - 1))) for i in range(users)
+    ]
+
+
+def _names(vocabulary, count):
+    """ Return count distinct names, numbered past the vocabulary"""
+    return [
+        vocabulary[i] if i < len(vocabulary)
+        else f'{vocabulary[i % len(vocabulary)]} {i // len(vocabulary)}'
+        for i in range(count)
+    ]
+
+
+def seed_dataset(users, smallest, largest, tags=200, ingredients=500,
+                 exponent=1.1, seed=0, password=None, prefix='seed'):
+    """ Create users with skewed collections, returning them with their
+    number of recipes, smallest first
+
+    Tags and ingredients are used following Zipf's law, so a few names
+    are on most recipes and the long tail on a handful. Recipes go
+    through bulk_create_with_relations, keeping stats and search current.
+    """
+    rng = random.Random(seed)
+    created = []
+    for i, count in enumerate(recipe_counts(users, smallest, largest)):
+        user = get_user_model().objects.create_user(
+            f'{prefix}-{i}@example.com',
+            password
+        )
+        names = {}
+        for model, vocabulary, total in (
+            (Tag, TAGS, tags),
+            (Ingredient, INGREDIENTS, ingredients),
+        ):
+            # Small collections only use their most popular names
+            size = max(min(total, count // 2), 1)
+            model.objects.bulk_create(
+                (model(user=user, name=name)
+                 for name in _names(vocabulary, size)),
+                batch_size=1000
+            )
+            names[model] = (
+                list(model.objects.filter(user=user).order_by(
+                    'id'
+                ).values_list('id', flat=True)),
+                zipf_weights(size, exponent)
+            )
+
+        remaining = count
+        while remaining:
+            batch = min(remaining, 5000)
+            remaining -= batch
+            recipes, links = [], {Tag: [], Ingredient: []}
+            for _ in range(batch):
+                recipes.append(Recipe(
+                    user=user,
+                    title=f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}',
+                    time_minute=rng.randint(5, 180),
+                    # Log-normal prices, mostly cheap with a long tail
+                    price=Decimal(
+                        f'{min(math.exp(rng.gauss(2.2, 0.6)), 999):.2f}'
+                    )
+                ))
+                for model, (ids, weights) in names.items():
+                    picks = 3 if model is Tag else 6
+                    links[model].append([
+                        ids[index] for index in zipf_sample(
+                            rng, weights, rng.randint(1, picks)
+                        )
+                    ])
+            with transaction.atomic():
+                number_recipes(recipes)
+                Recipe.objects.bulk_create_with_relations(
+                    recipes, links[Tag], links[Ingredient]
+                )
+        created.append((user, count))
+
+    return created
+
+
+def percentile(values, percent):
+    """ Return the nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def list_queryset(viewset, user, params=None):
+    """ Return the queryset a list request with params would run"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    request.user = user
+    view = viewset(
+        request=request,
+        action='list',
+        format_kwarg=None,
+        kwargs={}
+    )
+    return view.filter_queryset(view.get_queryset())
+
+
+def time_call(func, repeat):
+    """ Call func repeat times and return the median duration in ms"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+class BenchmarkCommand(BaseCommand):
+    """ Base of the bench_* management commands
+
+    Subclasses implement ``benchmark(**options)`` and time their cases
+    with ``self.time``, the median of ``--repeat`` calls. The benchmark
+    runs in a transaction that is rolled back, so seeded rows never
+    persist, unless ``rollback`` is False.
+    """
+    repeat = 20
+    rollback = True
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=self.repeat,
+            help='Calls each reported median is taken over'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        if not self.rollback:
+            self.benchmark(**options)
+            return
+
+        with transaction.atomic():
+            self.benchmark(**options)
+            transaction.set_rollback(True)
+
+    def benchmark(self, **options):
+        raise NotImplementedError
+
+    def time(self, func):
+        """ Return the median duration of func in ms"""
+        return time_call(func, self.repeat)
@@ -0,0 +1,19 @@
+from django.db import connections
+from django.db.models import Max
+from .models import Recipe
+
+
+def number_recipes(recipes, using='default'):
+    """ Assign the primary keys of unsaved recipes on databases that cannot
+    return them from a bulk insert, such as SQLite
+
+    Recipe.objects.bulk_create_with_relations then bulk inserts them
+    instead of saving them one by one. Only for offline loaders running
+    inside a transaction: SQLite holds its write lock from the first
+    insert, and a concurrent insert of the same ids fails loudly.
+    """
+    if connections[using].features.can_return_rows_from_bulk_insert:
+        return
+    last = Recipe.objects.using(using).aggregate(last=Max('id'))['last']
+    for offset, recipe in enumerate(recipes, 1):
+        recipe.id = (last or 0) + offset
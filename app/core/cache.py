@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """ Thread safe in-process LRU cache with an optional TTL in seconds
+
+    Entries are evicted once there are more than ``maxsize`` of them or,
+    when ``sizeof`` is given, once their total size exceeds ``maxbytes``.
+    """
+
+    def __init__(self, maxsize, ttl=None, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.currbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Return the value for key, marking it as recently used"""
+        with self._lock:
+            try:
+                value, expires, _ = self._data[key]
+            except KeyError:
+                return default
+            if expires is not None and expires < time.monotonic():
+                self._pop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """ Store value, evicting the least recently used entries"""
+        expires = None
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return
+
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, expires, size)
+            self.currbytes += size
+            while len(self._data) > self.maxsize or (
+                self.maxbytes is not None and self.currbytes > self.maxbytes
+            ):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.currbytes -= evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.currbytes = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.currbytes -= entry[2]
+
+    def __len__(self):
+        return len(self._data)
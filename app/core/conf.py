@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def setting_reader(setting):
+    """ Return a reader of the entries of a dict setting
+
+    ``_export_setting = setting_reader('RECIPE_EXPORT')`` makes
+    ``_export_setting('CHUNK_SIZE', 500)`` return the entry, or the
+    default when the setting or the entry is missing. The setting is
+    looked up on every call, so override_settings applies.
+    """
+    def read(name, default):
+        return getattr(settings, setting, {}).get(name, default)
+
+    return read
@@ -0,0 +1,198 @@
+import contextlib
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from .conf import setting_reader
+
+logger = logging.getLogger(__name__)
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+_timing_setting = setting_reader('REQUEST_TIMING')
+
+
+def timing_sampled():
+    """ Whether the current request is picked for instrumentation"""
+    rate = _timing_setting('SAMPLE_RATE', 0.01)
+    return rate >= 1 or random.random() < rate
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """ Return the SQL with literals, placeholders and IN lists of any
+    length normalized, so repetitions of a query compare equal"""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def current_metrics():
+    """ Return the RequestMetrics of the request being served, if sampled"""
+    return getattr(_local, 'metrics', None)
+
+
+class RequestMetrics:
+    """ Queries and timings of one request
+
+    The instance is installed as a database execute wrapper, counting and
+    timing every query and its fingerprint. Phases measured by
+    ``measure`` exclude the database time spent within them.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @contextlib.contextmanager
+    def activate(self):
+        """ Make the metrics current for the duration of the block"""
+        previous = current_metrics()
+        _local.metrics = self
+        try:
+            yield self
+        finally:
+            _local.metrics = previous
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        """ Add the time spent in the block, minus queries, to the phase"""
+        start, db_time = time.perf_counter(), self.db_time
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start - (self.db_time - db_time)
+            self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+
+    def duplicates(self, threshold):
+        """ Return the fingerprints run at least threshold times, the
+        signature of a query issued once per object"""
+        return [
+            (sql, count) for sql, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def durations(self):
+        """ Return the milliseconds of the database, of every measured
+        phase and of the whole request so far"""
+        durations = {'db': self.db_time * 1000}
+        for phase, elapsed in self.phases.items():
+            durations[phase] = elapsed * 1000
+        durations['total'] = (time.perf_counter() - self.start) * 1000
+        return durations
+
+    def server_timing(self, durations):
+        """ Return the Server-Timing header value of the durations"""
+        metrics = []
+        for name, duration in durations.items():
+            metric = f'{name};dur={duration:.2f}'
+            if name == 'db':
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+        return ', '.join(metrics)
+
+    def log(self, request, response, durations):
+        """ Log the request as one JSON line, as a warning when some query
+        repeats N+1 style"""
+        duplicates = self.duplicates(
+            _timing_setting('DUPLICATE_THRESHOLD', 10)
+        )
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': self.queries,
+        }
+        record.update(
+            (f'{name}_ms', round(duration, 2))
+            for name, duration in durations.items()
+        )
+        if duplicates:
+            record['duplicates'] = [
+                {'sql': sql, 'count': count} for sql, count in duplicates
+            ]
+        logger.log(
+            logging.WARNING if duplicates else logging.INFO,
+            json.dumps(record, sort_keys=True)
+        )
+
+    def report(self, request, response):
+        """ Send the Server-Timing header and log the request, as the
+        REQUEST_TIMING setting asks"""
+        durations = self.durations()
+        if _timing_setting('SERVER_TIMING', True):
+            response['Server-Timing'] = self.server_timing(durations)
+        if _timing_setting('LOG', True):
+            self.log(request, response, durations)
+
+
+class _TimedSerializer:
+    """ Serializer proxy adding the time spent building ``data`` to the
+    serialize phase"""
+
+    def __init__(self, serializer, metrics):
+        self._serializer = serializer
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._serializer, name)
+
+    @property
+    def data(self):
+        with self._metrics.measure('serialize'):
+            return self._serializer.data
+
+
+class InstrumentedViewMixin:
+    """ Measure serialization and rendering of sampled requests
+
+    RequestTimingMiddleware only sees the request as a whole, this splits
+    out the time DRF spends in the serializers' ``data`` and in the
+    renderer. The serializers are wrapped for the handler only, whatever
+    the view's own get_serializer returns, and responses are rendered
+    here rather than by the handler so the renderer runs measured.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = current_metrics()
+        if metrics is not None:
+            get_serializer = self.get_serializer
+            self.get_serializer = lambda *args, **kwargs: _TimedSerializer(
+                get_serializer(*args, **kwargs), metrics
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # The browsable API builds forms with serializers while rendering
+        self.__dict__.pop('get_serializer', None)
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        metrics = current_metrics()
+        if metrics is not None and hasattr(response, 'render'):
+            with metrics.measure('render'):
+                response.render()
+        return response
@@ -0,0 +1,122 @@
+import os
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.models import CollectionVersion, ImageBlob, Recipe
+from core.storage import CAS_PREFIX, file_digest
+from recipe.imaging import RENDITIONS, rendition_name
+
+
+class Command(BaseCommand):
+    """ Django command moving recipe images into content-addressed storage"""
+    help = 'Backfill recipe images into the content-addressed store'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--gc', action='store_true',
+            help='Also delete stored images no recipe references'
+        )
+        parser.add_argument(
+            '--gc-grace', type=int, default=3600,
+            help='Seconds an unreferenced image is kept before deletion'
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'adopt'):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE is not content addressed'
+            )
+
+        moved = duplicates = missing = reclaimed = 0
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).exclude(image__startswith=CAS_PREFIX).only('id', 'user_id', 'image')
+        for recipe in recipes.iterator():
+            name = recipe.image.name
+            if not default_storage.exists(name):
+                missing += 1
+                continue
+
+            size = default_storage.size(name)
+            with default_storage.open(name) as content:
+                digest = file_digest(content)
+            hashed = default_storage.hashed_name(
+                digest,
+                os.path.splitext(name)[1].lstrip('.').lower()
+            )
+            if default_storage.exists(hashed):
+                duplicates += 1
+                reclaimed += size
+            else:
+                moved += 1
+            with transaction.atomic():
+                default_storage.adopt(name, digest)
+                reclaimed += self._move_renditions(name, hashed)
+
+                Recipe.objects.filter(pk=recipe.pk).update(image=hashed)
+                ImageBlob.adjust(hashed, 1)
+                CollectionVersion.bump(recipe.user_id)
+
+        self.stdout.write(
+            f'{moved} images moved, {duplicates} duplicates removed, '
+            f'{missing} missing'
+        )
+        if options['gc']:
+            reclaimed += self._collect(options['gc_grace'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{reclaimed} bytes reclaimed'
+        ))
+
+    def _move_renditions(self, name, hashed):
+        """ Move the renditions along, returning the bytes freed"""
+        freed = 0
+        for rendition in RENDITIONS:
+            old = rendition_name(name, rendition[0])
+            new = rendition_name(hashed, rendition[0])
+            if not default_storage.exists(old):
+                continue
+            if default_storage.exists(new):
+                freed += default_storage.size(old)
+                default_storage.delete(old)
+            else:
+                os.replace(
+                    default_storage.path(old),
+                    default_storage.path(new)
+                )
+        return freed
+
+    def _collect(self, grace):
+        """ Delete unreferenced images and renditions past the grace time
+
+        Only files whose ImageBlob row has no references and was last
+        touched before the grace time go. The row stays locked while its
+        files are deleted, so a storage write reserving the same name
+        waits and then writes the file again.
+        """
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        freed = collected = 0
+        orphans = ImageBlob.objects.filter(refs__lte=0, updated__lt=cutoff)
+        for name in orphans.values_list('name', flat=True).iterator():
+            with transaction.atomic():
+                # Re-check under the lock so a new reference wins the race
+                blob = ImageBlob.objects.select_for_update().filter(
+                    name=name, refs__lte=0, updated__lt=cutoff
+                ).first()
+                if blob is None:
+                    continue
+
+                collected += 1
+                names = [name] + [
+                    rendition_name(name, rendition[0])
+                    for rendition in RENDITIONS
+                ]
+                for stored in names:
+                    if default_storage.exists(stored):
+                        freed += default_storage.size(stored)
+                        default_storage.delete(stored)
+                blob.delete()
+
+        self.stdout.write(f'{collected} unreferenced images collected')
+        return freed
@@ -0,0 +1,63 @@
+import random
+from django.contrib.auth import get_user_model
+from core.benchmark import BenchmarkCommand, time_call
+from core.models import Tag
+from recipe.autocomplete import NameIndex, autocomplete, get_name_index
+
+SYLLABLES = (
+    'ba', 'co', 'di', 'fe', 'ga', 'hu', 'ki', 'lo', 'ma', 'ne',
+    'po', 'ra', 'si', 'to', 'va', 'zu', 'ch', 'an', 'el', 'or',
+)
+
+
+def _name(rng):
+    words = rng.randint(1, 3)
+    return ' '.join(
+        ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(words)
+    ).capitalize()
+
+
+class Command(BenchmarkCommand):
+    """ Django command to time tag autocompletion"""
+    help = 'Benchmark tag autocompletion against a seeded set of names'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--names', type=int, default=100000)
+
+    def benchmark(self, **options):
+        rng = random.Random(0)
+        user = get_user_model().objects.create_user(
+            'bench-autocomplete@example.com'
+        )
+        Tag.objects.bulk_create(
+            (
+                # Suffixed, as names are unique per user
+                Tag(user=user, name=f'{_name(rng)} {i}')
+                for i in range(options['names'])
+            ),
+            batch_size=1000
+        )
+        queryset = Tag.objects.filter(user=user)
+        rows = list(queryset.values_list('id', 'name'))
+        # A typo in an existing name, as a user would type it
+        typo = rows[0][1].split()[0][:-1] + 'x'
+
+        median = time_call(lambda: NameIndex(rows), 3)
+        self.stdout.write(
+            f'{"index build":<24} {len(rows):>7} names {median:>9.2f} ms'
+        )
+        for label, params, use_index in (
+            ('database prefix', {'prefix': 'Ko'}, False),
+            ('database fuzzy', {'query': typo}, False),
+            ('index prefix', {'prefix': 'Ko'}, True),
+            ('index fuzzy', {'query': typo}, True),
+        ):
+            if use_index:
+                # Time hot users, whose index is already built
+                get_name_index(Tag, user.pk, force=True)
+            median = self.time(lambda: list(autocomplete(
+                queryset, user.pk, use_index=use_index, **params
+            )))
+            self.stdout.write(f'{label:<24} {median:>15.2f} ms')
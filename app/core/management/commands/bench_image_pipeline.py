@@ -0,0 +1,61 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from core.benchmark import BenchmarkCommand
+from recipe.imaging import RENDITIONS, render_renditions
+
+
+class Command(BenchmarkCommand):
+    """ Django command to measure the image pipeline throughput"""
+    help = 'Benchmark rendering image renditions per worker process'
+
+    repeat = 3
+    rollback = False
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--images', type=int, default=24)
+        parser.add_argument('--width', type=int, default=3000)
+        parser.add_argument('--height', type=int, default=2000)
+        parser.add_argument(
+            '--workers', default=f'1,{os.cpu_count() or 1}',
+            help='Comma separated pool sizes to compare'
+        )
+
+    def benchmark(self, **options):
+        size = (options['width'], options['height'])
+        with tempfile.TemporaryDirectory() as tmp:
+            sources = []
+            for i in range(options['images']):
+                path = os.path.join(tmp, f'source-{i}.jpg')
+                noise = Image.effect_noise(size, 64).convert('RGB')
+                noise.save(path, 'JPEG', quality=90)
+                sources.append(path)
+
+            pool_sizes = {int(w) for w in options['workers'].split(',')}
+            for workers in sorted(pool_sizes):
+                out = os.path.join(tmp, str(workers))
+                targets = [
+                    [
+                        (
+                            os.path.join(out, f'{i}-{key}.{ext}'),
+                            box,
+                            image_format
+                        )
+                        for key, box, image_format, ext in RENDITIONS
+                    ]
+                    for i in range(len(sources))
+                ]
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    # Warm up the workers before timing
+                    list(pool.map(render_renditions, sources[:1], targets[:1]))
+                    median = self.time(lambda: list(
+                        pool.map(render_renditions, sources, targets)
+                    ))
+
+                rate = len(sources) / (median / 1000)
+                self.stdout.write(
+                    f'{workers:>3} workers {rate:>8.2f} images/s '
+                    f'{rate / workers:>8.2f} images/s/core'
+                )
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import uuid
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+from core.benchmark import BenchmarkCommand
+from core.views import serve_media
+
+
+def _consume(response):
+    for _ in response:
+        pass
+    response.close()
+    return response
+
+
+class Command(BenchmarkCommand):
+    """ Django command comparing the media views"""
+    help = (
+        'Benchmark serving media files through Django. Full bodies are '
+        'read in Python here, WSGI servers with a file_wrapper send them '
+        'with sendfile instead'
+    )
+
+    repeat = 50
+    rollback = False
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--size', type=int, default=4 * 1024 * 1024,
+            help='Size of the served file in bytes'
+        )
+
+    def benchmark(self, **options):
+        factory = RequestFactory()
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media):
+            name = f'{uuid.uuid4()}.jpg'
+            with open(os.path.join(media, name), 'wb') as f:
+                f.write(os.urandom(options['size']))
+
+            full = factory.get(f'/media/{name}')
+            ranged = factory.get(f'/media/{name}', HTTP_RANGE='bytes=0-65535')
+            revalidate = factory.get(
+                f'/media/{name}',
+                HTTP_IF_NONE_MATCH=_consume(serve_media(full, name))['ETag']
+            )
+            offload = {'SENDFILE': 'x-sendfile'}
+            for label, request, view, serving in (
+                ('static.serve full', full, serve, None),
+                ('serve_media full', full, serve_media, {}),
+                ('serve_media 64K range', ranged, serve_media, {}),
+                ('serve_media 304', revalidate, serve_media, {}),
+                ('serve_media x-sendfile', full, serve_media, offload),
+            ):
+                kwargs = {'document_root': media} if serving is None else {}
+                with override_settings(MEDIA_SERVING=serving or {}):
+                    median = self.time(
+                        lambda: _consume(view(request, name, **kwargs))
+                    )
+                self.stdout.write(f'{label:<24} {median:>9.3f} ms')
@@ -0,0 +1,45 @@
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.benchmark import BenchmarkCommand, seed_user
+from recipe.views import RecipeViewSet
+
+PROJECTIONS = (
+    ('default', {}),
+    ('fields=id,title', {'fields': 'id,title'}),
+    ('expand=tags,ingredient', {'expand': 'tags,ingredient'}),
+    ('fields=id,title expand=tags', {'fields': 'id,title', 'expand': 'tags'}),
+)
+
+
+class Command(BenchmarkCommand):
+    """ Django command to time recipe list projections"""
+    help = 'Benchmark the payload size and latency of recipe fieldsets'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--recipes', type=int, default=2000)
+
+    def benchmark(self, **options):
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({'get': 'list'})
+        user = seed_user(
+            'bench-recipe-fields@example.com',
+            options['recipes']
+        )
+
+        # Cursor links are built from the host, which has to be allowed
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for label, params in PROJECTIONS:
+                def render():
+                    request = factory.get(
+                        '/api/recipe/recipes/',
+                        dict(params, page_size=100)
+                    )
+                    force_authenticate(request, user=user)
+                    return view(request).render()
+
+                size = len(render().content)
+                median = self.time(render)
+                self.stdout.write(
+                    f'{label:<28} {size:>9} bytes {median:>9.2f} ms'
+                )
@@ -0,0 +1,56 @@
+from core.benchmark import BenchmarkCommand, list_queryset, seed_user
+from recipe.views import RecipeViewSet
+
+
+class Command(BenchmarkCommand):
+    """ Django command to time multi-tag/ingredient recipe filters"""
+    help = (
+        'Benchmark the recipe list filters and search against a seeded '
+        'dataset'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--recipes', type=int, default=10000)
+
+    def benchmark(self, **options):
+        user = seed_user(
+            'bench-recipe-filters@example.com',
+            options['recipes']
+        )
+        # Filter on the links of one recipe so match=all has hits
+        recipe = user.recipe_set.first()
+        tags = ','.join(
+            str(pk) for pk in recipe.tags.values_list('id', flat=True)
+        )
+        ingredients = ','.join(
+            str(pk) for pk in
+            recipe.ingredient.values_list('id', flat=True)[:3]
+        )
+
+        for match in RecipeViewSet.MATCH_MODES:
+            for label, params in (
+                ('tags', {'tags': tags}),
+                ('ingredient', {'ingredient': ingredients}),
+                ('both', {'tags': tags, 'ingredient': ingredients}),
+            ):
+                params['match'] = match
+                queryset = list_queryset(RecipeViewSet, user, params)
+                rows = len(queryset.values_list('id', flat=True))
+                median = self.time(lambda: list(queryset.all()))
+                self.stdout.write(
+                    f'match={match:<4} {label:<11} '
+                    f'{rows:>7} rows {median:>9.2f} ms'
+                )
+
+        # Every title contains 'recipe', the worst case for ranking
+        for search in ('recipe', f'recipe {recipe.title.split()[-1]}'):
+            params = {'search': search}
+            rows = len(list_queryset(RecipeViewSet, user, params))
+            # Ranking happens while building the queryset, so time both
+            median = self.time(
+                lambda: list(list_queryset(RecipeViewSet, user, params))
+            )
+            self.stdout.write(
+                f'search={search!r:<18} {rows:>7} rows {median:>9.2f} ms'
+            )
@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+from core.benchmark import BenchmarkCommand, seed_user
+from core.middleware import compress_bytes, supported_codings
+from core.models import Recipe
+from core.renderers import FastJSONRenderer, orjson
+from recipe.fastpath import FastRecipeSerializer, recipe_columns
+
+
+class Command(BenchmarkCommand):
+    """ Django command to time rendering and compressing recipe lists"""
+    help = 'Benchmark JSON renderers and response compression'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--recipes', type=int, nargs='+', default=[1000, 10000]
+        )
+
+    def benchmark(self, **options):
+        if orjson is None:
+            self.stdout.write('orjson is not installed, both renderers match')
+
+        for count in options['recipes']:
+            user = seed_user(f'bench-rendering-{count}@example.com', count)
+            data = FastRecipeSerializer(
+                Recipe.objects.filter(user=user).values(*recipe_columns()),
+                many=True
+            ).data
+
+            for label, renderer in (
+                ('JSONRenderer', JSONRenderer()),
+                ('FastJSONRenderer', FastJSONRenderer()),
+            ):
+                median = self.time(lambda: renderer.render(data))
+                self.stdout.write(
+                    f'{count:>6} recipes {label:<18} '
+                    f'{len(renderer.render(data)):>10} bytes '
+                    f'{median:>9.2f} ms'
+                )
+
+            body = FastJSONRenderer().render(data)
+            for coding in supported_codings():
+                median = self.time(lambda: compress_bytes(coding, body))
+                self.stdout.write(
+                    f'{count:>6} recipes {coding:<18} '
+                    f'{len(compress_bytes(coding, body)):>10} bytes '
+                    f'{median:>9.2f} ms'
+                )
@@ -0,0 +1,81 @@
+from rest_framework.renderers import JSONRenderer
+from core.benchmark import BenchmarkCommand, seed_user
+from core.models import Recipe, Tag
+from recipe.fastpath import FastNameSerializer, FastRecipeSerializer, \
+                            recipe_columns
+from recipe.serializers import RecipeDetailSerializer, RecipeSerializer, \
+                               TagSerializer
+
+
+class Command(BenchmarkCommand):
+    """ Django command comparing the DRF and fast read serializers"""
+    help = 'Benchmark the DRF serializers against recipe.fastpath'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--recipes', type=int, default=2000)
+
+    def benchmark(self, **options):
+        renderer = JSONRenderer()
+        user = seed_user(
+            'bench-serializers@example.com',
+            options['recipes']
+        )
+        recipes = Recipe.objects.filter(user=user).order_by('-id')
+        tags = Tag.objects.filter(user=user).order_by('-name')
+        detail = recipes.first().pk
+
+        # Each case queries, serializes and renders, like a request
+        for label, drf, fast in (
+            (
+                'recipe list',
+                lambda: RecipeSerializer(
+                    recipes.prefetch_related('tags', 'ingredient'),
+                    many=True
+                ).data,
+                lambda: FastRecipeSerializer(
+                    recipes.values(*recipe_columns()), many=True
+                ).data,
+            ),
+            (
+                'recipe list expanded',
+                lambda: RecipeSerializer(
+                    recipes.prefetch_related('tags', 'ingredient'),
+                    many=True,
+                    expand=('tags', 'ingredient')
+                ).data,
+                lambda: FastRecipeSerializer(
+                    recipes.values(*recipe_columns()),
+                    many=True,
+                    expand=('tags', 'ingredient')
+                ).data,
+            ),
+            (
+                'recipe detail',
+                lambda: RecipeDetailSerializer(
+                    recipes.prefetch_related(
+                        'tags', 'ingredient'
+                    ).get(pk=detail)
+                ).data,
+                lambda: FastRecipeSerializer(
+                    recipes.values(*recipe_columns()).get(pk=detail),
+                    expand=('tags', 'ingredient')
+                ).data,
+            ),
+            (
+                'tag list',
+                lambda: TagSerializer(tags, many=True).data,
+                lambda: FastNameSerializer(
+                    tags.values(*TagSerializer.Meta.fields), many=True
+                ).data,
+            ),
+        ):
+            timings = [
+                self.time(lambda: renderer.render(serialize()))
+                for serialize in (drf, fast)
+            ]
+            self.stdout.write(
+                f'{label:<22} drf {timings[0]:>9.2f} ms '
+                f'fast {timings[1]:>9.2f} ms '
+                f'{timings[0] / max(timings[1], 1e-6):>6.1f}x'
+            )
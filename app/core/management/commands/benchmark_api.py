@@ -0,0 +1,224 @@
+import json
+import time
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from core.benchmark import BenchmarkCommand, percentile, seed_dataset
+
+PASSWORD = 'benchmark'
+
+# label, method, url name, url args, params; values are formatted with
+# the user's hottest tag, a recipe, a title word and a name prefix
+ENDPOINTS = (
+    ('recipes page', 'get', 'recipe:recipe-list', (), {'page_size': 50}),
+    (
+        'recipes by tag', 'get', 'recipe:recipe-list', (),
+        {'tags': '{tag}', 'page_size': 50}
+    ),
+    ('recipes search', 'get', 'recipe:recipe-list', (), {'search': '{word}'}),
+    (
+        'recipes fields', 'get', 'recipe:recipe-list', (),
+        {'fields': 'id,title', 'page_size': 100}
+    ),
+    ('recipe detail', 'get', 'recipe:recipe-detail', ('{recipe}',), {}),
+    ('recipe stats', 'get', 'recipe:recipe-stats', (), {}),
+    ('tags', 'get', 'recipe:tag-list', (), {'page_size': 100}),
+    (
+        'tags with counts', 'get', 'recipe:tag-list', (),
+        {'with_counts': 1, 'page_size': 100}
+    ),
+    (
+        'ingredients assigned', 'get', 'recipe:ingredient-list', (),
+        {'assigned_only': 1, 'page_size': 100}
+    ),
+    ('tag autocomplete', 'get', 'recipe:tag-list', (), {'prefix': '{prefix}'}),
+    ('user me', 'get', 'user:me', (), {}),
+    (
+        'user token', 'post', 'user:token', (),
+        {'email': '{email}', 'password': PASSWORD}
+    ),
+)
+
+
+class Command(BenchmarkCommand):
+    """ Django command measuring the API endpoints end to end"""
+    help = (
+        'Report latency percentiles, queries and allocations per request '
+        'of every API endpoint, optionally checked against a baseline'
+    )
+
+    repeat = 30
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--email', action='append', default=[],
+            help=f"Benchmark an existing user, whose password is '{PASSWORD}'"
+        )
+        parser.add_argument(
+            '--seed-users', type=int, default=0,
+            help='Benchmark a throwaway dataset of this many users'
+        )
+        parser.add_argument('--max-recipes', type=int, default=100000)
+        parser.add_argument(
+            '--baseline',
+            help='JSON file of a previous run to compare against'
+        )
+        parser.add_argument(
+            '--write-baseline', action='store_true',
+            help='Write the results to --baseline instead of comparing'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.5,
+            help='Allowed relative growth of median latency and allocations'
+        )
+
+    def handle(self, *args, **options):
+        if not options['email'] and not options['seed_users']:
+            raise CommandError('Pass --email or --seed-users')
+        if options['write_baseline'] and not options['baseline']:
+            raise CommandError('--write-baseline needs --baseline')
+
+        # Never keep seeded data or tokens around
+        super().handle(*args, **options)
+
+    def benchmark(self, **options):
+        if options['seed_users']:
+            users = [
+                (f'{count} recipes', user)
+                for user, count in seed_dataset(
+                    options['seed_users'],
+                    10,
+                    options['max_recipes'],
+                    password=PASSWORD,
+                    prefix='benchmark-api'
+                )
+            ]
+        else:
+            users = []
+            for email in options['email']:
+                user = get_user_model().objects.filter(email=email).first()
+                if user is None:
+                    raise CommandError(f'User {email} does not exist')
+                users.append((email, user))
+
+        results = {}
+        # The test client talks to the application in process
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for label, user in users:
+                for endpoint, result in self._benchmark(user):
+                    results[f'{label} {endpoint}'] = result
+                    self.stdout.write(
+                        f'{label:<16} {endpoint:<22} '
+                        f'p50 {result["p50"]:>8.2f} '
+                        f'p95 {result["p95"]:>8.2f} '
+                        f'p99 {result["p99"]:>8.2f} ms '
+                        f'{result["queries"]:>3} queries '
+                        f'{result["alloc_kb"]:>8.1f} KiB'
+                    )
+
+        if options['write_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Baseline written to {options["baseline"]}')
+        elif options['baseline']:
+            self._compare(results, options['baseline'], options['tolerance'])
+
+    def _requests(self, user):
+        """ Return the label and client call of every endpoint"""
+        recipes = user.recipe_set.order_by('-id')
+        recipe = recipes.first()
+        tag = user.tag_set.order_by('id').first()
+        values = {
+            'email': user.email,
+            'recipe': recipe.id if recipe else 0,
+            'tag': tag.id if tag else 0,
+            'word': recipe.title.split()[-1] if recipe else 'soup',
+            'prefix': tag.name[:2] if tag else 'a',
+        }
+        for label, method, name, args, params in ENDPOINTS:
+            url = reverse(name, args=[
+                str(arg).format(**values) for arg in args
+            ])
+            params = {
+                key: str(value).format(**values)
+                for key, value in params.items()
+            }
+            yield label, method, url, params
+
+    def _benchmark(self, user):
+        """ Yield the measurements of every endpoint for the user"""
+        token, _ = Token.objects.get_or_create(user=user)
+        client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        for label, method, url, params in self._requests(user):
+            def call():
+                response = getattr(client, method)(url, params)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{label} answered {response.status_code}'
+                    )
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            # Warm caches, then count queries and allocations on one call.
+            # The query log is bounded, a full one would capture nothing
+            call()
+            reset_queries()
+            tracemalloc.start()
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    call()
+                _, peak = tracemalloc.get_traced_memory()
+                # Read now, the captured queries are a view of the log
+                query_count = len(queries)
+            finally:
+                tracemalloc.stop()
+
+            timings = []
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            yield label, {
+                'p50': round(percentile(timings, 50), 3),
+                'p95': round(percentile(timings, 95), 3),
+                'p99': round(percentile(timings, 99), 3),
+                'queries': query_count,
+                'alloc_kb': round(peak / 1024, 1),
+            }
+
+    def _compare(self, results, path, tolerance):
+        """ Fail on endpoints running more queries than in the baseline,
+        or slower or allocating more beyond the tolerance"""
+        with open(path) as f:
+            baseline = json.load(f)
+
+        regressions = []
+        for key, result in results.items():
+            expected = baseline.get(key)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{key}: {result["queries"]} queries, '
+                    f'baseline {expected["queries"]}'
+                )
+            # The median, as tail latencies are too noisy to compare
+            for metric in ('p50', 'alloc_kb'):
+                if result[metric] > expected[metric] * (1 + tolerance):
+                    regressions.append(
+                        f'{key}: {metric} {result[metric]}, '
+                        f'baseline {expected[metric]}'
+                    )
+
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(regression))
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
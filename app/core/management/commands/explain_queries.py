@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from core.benchmark import list_queryset, seed_user
+from recipe import views
+
+
+ENDPOINTS = (
+    ('tags', views.TagViewSet, {}),
+    ('tags assigned_only', views.TagViewSet, {'assigned_only': 1}),
+    ('ingredients', views.IngredientViewSet, {}),
+    (
+        'ingredients assigned_only',
+        views.IngredientViewSet,
+        {'assigned_only': 1}
+    ),
+    ('recipes', views.RecipeViewSet, {}),
+    ('recipes by tags', views.RecipeViewSet, {'tags': '{tags}'}),
+    (
+        'recipes by ingredient',
+        views.RecipeViewSet,
+        {'ingredient': '{ingredients}'}
+    ),
+)
+
+
+class Command(BaseCommand):
+    """ Django command to EXPLAIN the query of every list endpoint"""
+    help = 'Print the query plan of each recipe API list endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='Explain the queries of an existing user'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed a throwaway user with this many recipes'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Run EXPLAIN ANALYZE (PostgreSQL only)'
+        )
+
+    def handle(self, *args, **options):
+        if not options['email'] and not options['seed']:
+            raise CommandError('Pass --email or --seed')
+
+        with transaction.atomic():
+            if options['seed']:
+                user = seed_user(
+                    'explain-queries@example.com',
+                    options['seed']
+                )
+            else:
+                user = get_user_model().objects.filter(
+                    email=options['email']
+                ).first()
+                if user is None:
+                    raise CommandError('User does not exist')
+
+            self._explain(user, options['analyze'])
+            # Never keep the seeded data around
+            transaction.set_rollback(True)
+
+    def _explain(self, user, analyze):
+        """ Print the plan of each endpoint's queryset for the user"""
+        tag_ids = user.tag_set.values_list('id', flat=True)[:3]
+        ingredient_ids = user.ingredient_set.values_list('id', flat=True)[:3]
+        ids = {
+            'tags': ','.join(str(pk) for pk in tag_ids),
+            'ingredients': ','.join(str(pk) for pk in ingredient_ids),
+        }
+        explain_options = {}
+        if analyze and connection.vendor == 'postgresql':
+            explain_options['analyze'] = True
+
+        for label, viewset, params in ENDPOINTS:
+            params = {
+                key: str(value).format(**ids) for key, value in params.items()
+            }
+            queryset = list_queryset(viewset, user, params)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
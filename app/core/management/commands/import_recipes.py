@@ -0,0 +1,192 @@
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.bulk import number_recipes
+from core.models import Ingredient, Recipe, Tag
+
+FORMATS = ('csv', 'ndjson')
+RELATIONS = (('tags', Tag), ('ingredient', Ingredient))
+
+
+def _names(value):
+    """ Return the names of a tags or ingredient value, which holds a list
+    of names or of objects with a name, or a JSON array of those in CSV"""
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, list):
+        raise ValueError('expected a list of names')
+    return [
+        item['name'] if isinstance(item, dict) else str(item)
+        for item in value
+    ]
+
+
+class Command(BaseCommand):
+    """ Django command importing recipes in bulk for a user"""
+    help = (
+        'Import recipes from a CSV or NDJSON file, such as a recipe export, '
+        'creating missing tags and ingredients. Nothing is imported unless '
+        'every line is valid'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, '-' for stdin")
+        parser.add_argument(
+            '--email', required=True,
+            help='Email of the user owning the recipes'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Format of the file, guessed from its extension by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1][1:]
+        if file_format not in FORMATS:
+            raise CommandError('Pass --format csv or --format ndjson')
+
+        # name.lower() -> id of every tag and ingredient of the user
+        self.ids = {
+            relation: {
+                name.lower(): pk
+                for pk, name in model.objects.filter(
+                    user=user
+                ).values_list('id', 'name').iterator()
+            }
+            for relation, model in RELATIONS
+        }
+        self.user = user
+
+        stream = sys.stdin if path == '-' else open(
+            path, newline='', encoding='utf-8'
+        )
+        try:
+            records = self._read(stream, file_format)
+            imported, elapsed = self._import(records, options['batch_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{imported} recipes imported in {elapsed:.2f} s '
+            f'({imported / max(elapsed, 1e-6):.0f} recipes/s)'
+        ))
+
+    def _read(self, stream, file_format):
+        """ Yield the line number and fields of every recipe"""
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_num, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise CommandError(f'Line {line_num}: {exc}')
+                yield line_num, record
+
+    def _import(self, records, batch_size):
+        """ Insert the records a batch at a time, reporting progress
+
+        The whole file is one transaction, so a bad line leaves nothing
+        half imported and the file can simply be fixed and imported again.
+        Batches only bound the memory used.
+        """
+        imported = 0
+        start = time.perf_counter()
+        with transaction.atomic():
+            while True:
+                batch = [
+                    self._parse(line_num, record)
+                    for line_num, record in itertools.islice(
+                        records, batch_size
+                    )
+                ]
+                if not batch:
+                    break
+
+                self._resolve(batch)
+                recipes = [recipe for recipe, _ in batch]
+                number_recipes(recipes)
+                Recipe.objects.bulk_create_with_relations(
+                    recipes,
+                    *(
+                        [
+                            [self.ids[relation][name.lower()]
+                             for name in names[relation]]
+                            for _, names in batch
+                        ]
+                        for relation, _ in RELATIONS
+                    )
+                )
+
+                imported += len(batch)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'{imported} recipes inserted '
+                    f'({imported / max(elapsed, 1e-6):.0f} recipes/s)'
+                )
+        return imported, time.perf_counter() - start
+
+    def _parse(self, line_num, record):
+        """ Return an unsaved recipe and its related names"""
+        try:
+            title = (record.get('title') or '').strip()
+            if not title:
+                raise ValueError('title is required')
+            recipe = Recipe(
+                user=self.user,
+                title=title,
+                time_minute=int(record['time_minute']),
+                price=Decimal(str(record['price'])),
+                link=record.get('link') or ''
+            )
+            names = {
+                relation: [
+                    name.strip() for name in _names(record.get(relation))
+                    if name.strip()
+                ]
+                for relation, _ in RELATIONS
+            }
+            # Lengths, digits and finite prices, as the database expects
+            recipe.clean_fields(exclude=('user', 'image'))
+        except ValidationError as exc:
+            raise CommandError(f'Line {line_num}: {exc.message_dict}')
+        except (KeyError, TypeError, ValueError, InvalidOperation) as exc:
+            raise CommandError(f'Line {line_num}: {exc!r}')
+        return recipe, names
+
+    def _resolve(self, batch):
+        """ Create the tags and ingredients the map does not know yet"""
+        for relation, model in RELATIONS:
+            known = self.ids[relation]
+            missing = {
+                name.lower(): name
+                for _, names in batch for name in names[relation]
+                if name.lower() not in known
+            }
+            if missing:
+                for obj in model.objects.get_or_create_many(
+                    self.user.pk, missing.values()
+                ):
+                    known[obj.name.lower()] = obj.pk
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.benchmark import seed_dataset
+
+
+class Command(BaseCommand):
+    """ Django command seeding a synthetic dataset for benchmarks"""
+    help = (
+        'Create users with 10 to 100k recipes and Zipfian tag and '
+        'ingredient usage'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--min-recipes', type=int, default=10)
+        parser.add_argument('--max-recipes', type=int, default=100000)
+        parser.add_argument(
+            '--tags', type=int, default=200,
+            help='Tags of the largest users'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=500,
+            help='Ingredients of the largest users'
+        )
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Exponent of the tag and ingredient popularity'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--password', default='benchmark',
+            help='Password of the seeded users'
+        )
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Users are named <prefix>-<n>@example.com'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 < options['min_recipes'] <= options['max_recipes']:
+            raise CommandError('Pass 0 < --min-recipes <= --max-recipes')
+
+        start = time.perf_counter()
+        users = seed_dataset(
+            options['users'],
+            options['min_recipes'],
+            options['max_recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            exponent=options['zipf'],
+            seed=options['seed'],
+            password=options['password'],
+            prefix=options['prefix']
+        )
+        for user, count in users:
+            self.stdout.write(f'{user.email:<32} {count:>7} recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'{sum(count for _, count in users)} recipes seeded in '
+            f'{time.perf_counter() - start:.1f} s'
+        ))
@@ -0,0 +1,171 @@
+import contextlib
+import re
+import zlib
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from .instrumentation import RequestMetrics, timing_sampled
+from .conf import setting_reader
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+CODING = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*$')
+
+
+_compression_setting = setting_reader('RESPONSE_COMPRESSION')
+
+
+def supported_codings():
+    """ Return the supported content codings, preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(header):
+    """ Return the supported coding an Accept-Encoding header ranks
+    highest, or None"""
+    quality = {}
+    for item in header.split(','):
+        match = CODING.match(item)
+        if match:
+            try:
+                q = float(match.group(2)) if match.group(2) else 1.0
+            except ValueError:
+                continue
+            quality[match.group(1).lower()] = q
+
+    codings = supported_codings()
+    ranked = [
+        (quality.get(coding, quality.get('*', 0)), -i, coding)
+        for i, coding in enumerate(codings)
+    ]
+    q, _, coding = max(ranked)
+    return coding if q > 0 else None
+
+
+class _Compressor:
+    """ Incremental gzip or brotli compressor"""
+
+    def __init__(self, coding):
+        if coding == 'br':
+            self.compressor = brotli.Compressor(
+                quality=_compression_setting('BROTLI_QUALITY', 4)
+            )
+            self.compress = self.compressor.process
+            self.sync = self.compressor.flush
+            self.finish = self.compressor.finish
+        else:
+            self.compressor = zlib.compressobj(
+                _compression_setting('GZIP_LEVEL', 6),
+                zlib.DEFLATED,
+                16 + zlib.MAX_WBITS
+            )
+            self.compress = self.compressor.compress
+            self.sync = lambda: self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+
+def compress_bytes(coding, data):
+    compressor = _Compressor(coding)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(coding, chunks):
+    """ Compress an iterable of chunks, flushing after each one so
+    clients receive streamed responses as they are produced"""
+    compressor = _Compressor(coding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.sync()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """ Compress responses with the best coding the client accepts
+
+    Responses of RESPONSE_COMPRESSION['CONTENT_TYPES'] are compressed
+    with brotli, when installed, or gzip. Bodies under 'MIN_SIZE' bytes
+    are sent as they are, streamed bodies are compressed chunk by chunk.
+    Responses supporting ranges are left alone, as ranges apply to the
+    identity body, and so are those already encoded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (
+            response.status_code == 206 or
+            response.has_header('Accept-Ranges') or
+            response.has_header('Content-Encoding') or
+            not content_type.startswith(tuple(_compression_setting(
+                'CONTENT_TYPES',
+                ('application/json', 'application/x-ndjson')
+            )))
+        ):
+            return response
+
+        if not response.streaming and len(response.content) < (
+            _compression_setting('MIN_SIZE', 1024)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate_encoding(request.headers.get('Accept-Encoding', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                coding, response.streaming_content
+            )
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+        else:
+            compressed = compress_bytes(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs, a strong ETag has to be weakened
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
+
+
+class RequestTimingMiddleware:
+    """ Count the queries and time the phases of sampled requests
+
+    A share of REQUEST_TIMING['SAMPLE_RATE'] requests run with a
+    RequestMetrics wrapped around every database connection. Views with
+    InstrumentedViewMixin add serialization and rendering times. The
+    results go to a Server-Timing header, when 'SERVER_TIMING' is set,
+    and to one JSON log line on the core.instrumentation logger, raised
+    to a warning when a query fingerprint repeats 'DUPLICATE_THRESHOLD'
+    times. Streamed bodies are produced after the response leaves here
+    and are not measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not timing_sampled():
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            stack.enter_context(metrics.activate())
+            response = self.get_response(request)
+
+        metrics.report(request, response)
+        return response
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def add_search_vector(apps, schema_editor):
+    """ Add the maintained tsvector of recipes and its GIN index"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    config = getattr(settings, 'RECIPE_SEARCH', {}).get('CONFIG', 'english')
+    schema_editor.execute(
+        'ALTER TABLE core_recipe ADD COLUMN search_vector tsvector'
+    )
+    schema_editor.execute(
+        '''
+        UPDATE core_recipe SET search_vector =
+            setweight(to_tsvector(%(config)s::regconfig, title), 'A') ||
+            setweight(to_tsvector(%(config)s::regconfig, coalesce((
+                SELECT string_agg(t.name, ' ') FROM core_tag t
+                JOIN core_recipe_tags rt ON rt.tag_id = t.id
+                WHERE rt.recipe_id = core_recipe.id
+            ), '')), 'B') ||
+            setweight(to_tsvector(%(config)s::regconfig, coalesce((
+                SELECT string_agg(i.name, ' ') FROM core_ingredient i
+                JOIN core_recipe_ingredient ri ON ri.ingredient_id = i.id
+                WHERE ri.recipe_id = core_recipe.id
+            ), '')), 'C')
+        ''',
+        {'config': config}
+    )
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_vector_idx '
+        'ON core_recipe USING GIN (search_vector)'
+    )
+
+
+def remove_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute(
+        'ALTER TABLE core_recipe DROP COLUMN search_vector'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_imageblob'),
+    ]
+
+    operations = [
+        # Not a model field: it is only written by SQL and only exists on
+        # PostgreSQL, other databases use recipe.search's Python index
+        migrations.RunPython(add_search_vector, remove_search_vector),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def add_trigram_indexes(apps, schema_editor):
+    """ Index tag and ingredient names for pg_trgm autocompletion"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('core_tag', 'core_ingredient'):
+        schema_editor.execute(
+            f'CREATE INDEX {table}_name_trgm_idx '
+            f'ON {table} USING GIN (name gin_trgm_ops)'
+        )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for table in ('core_tag', 'core_ingredient'):
+        schema_editor.execute(f'DROP INDEX {table}_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
@@ -0,0 +1,94 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Lower
+
+BATCH_SIZE = 1000
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """ Merge tags and ingredients whose names only differ by case
+
+    The oldest row of every (user, lower(name)) group is kept and the
+    recipe links of the others are moved to it in batches, dropping the
+    links a recipe already has to the kept row. The collection version
+    of every affected user is bumped, expiring their list ETags and
+    cached recipe details.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    CollectionVersion = apps.get_model('core', 'CollectionVersion')
+    users = set()
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{model_name.lower()}_id'
+
+        kept = {}
+        merged = {}
+        rows = model.objects.order_by('id').values_list(
+            'id', 'user_id', Lower('name')
+        )
+        for pk, user_id, name in rows.iterator():
+            merged_into = kept.setdefault((user_id, name), pk)
+            if merged_into != pk:
+                merged[pk] = merged_into
+                users.add(user_id)
+
+        duplicates = list(merged)
+        for start in range(0, len(duplicates), BATCH_SIZE):
+            batch = duplicates[start:start + BATCH_SIZE]
+            links = through.objects.filter(**{f'{column}__in': batch})
+            linked = set(through.objects.filter(
+                recipe_id__in=links.values('recipe_id'),
+                **{f'{column}__in': {merged[pk] for pk in batch}}
+            ).values_list('recipe_id', column))
+
+            stale = []
+            moves = {}
+            for link_id, recipe_id, pk in links.values_list(
+                'id', 'recipe_id', column
+            ):
+                target = (recipe_id, merged[pk])
+                if target in linked:
+                    stale.append(link_id)
+                else:
+                    linked.add(target)
+                    moves.setdefault(merged[pk], []).append(link_id)
+
+            through.objects.filter(id__in=stale).delete()
+            for target, link_ids in moves.items():
+                through.objects.filter(id__in=link_ids).update(
+                    **{column: target}
+                )
+            model.objects.filter(id__in=batch).delete()
+
+    users = list(users)
+    for start in range(0, len(users), BATCH_SIZE):
+        CollectionVersion.objects.filter(
+            user_id__in=users[start:start + BATCH_SIZE]
+        ).update(version=F('version') + 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop
+        ),
+        # Expression indexes, which UniqueConstraint only supports from
+        # Django 4.0, and the conflict target of get_or_create_many
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_tag_user_lower_name_uniq '
+            'ON core_tag (user_id, lower(name))',
+            'DROP INDEX core_tag_user_lower_name_uniq',
+        ),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX core_ingredient_user_lower_name_uniq '
+            'ON core_ingredient (user_id, lower(name))',
+            'DROP INDEX core_ingredient_user_lower_name_uniq',
+        ),
+    ]
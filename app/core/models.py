@@ -1,9 +1,20 @@
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Lower, Now
+from django.db.models.signals import m2m_changed, post_delete, post_init, \
+                                     post_save, pre_delete
+from django.dispatch import receiver
+import bisect
+import io
+import itertools
 import uuid
 import os
+from decimal import Decimal
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.conf import settings
+from .storage import CAS_PREFIX
+from .conf import setting_reader
 
 
 def recipe_image_file_path(instance, filename):
@@ -47,6 +58,128 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+# Inserts the missing names of a user and returns the row of every requested
+# name, by position. Rows of the insert are not visible to the SELECT on the
+# table, so the union holds each name once. Names are matched with lower()
+# like the unique index, whatever Python's case folding says.
+UPSERT_NAMES_SQL = '''
+WITH wanted AS (
+    SELECT name, lower(name) AS lower_name, ord
+    FROM unnest(%(names)s::text[]) WITH ORDINALITY AS w(name, ord)
+), inserted AS (
+    INSERT INTO {table} (user_id, name)
+    SELECT %(user_id)s, name FROM wanted
+    ON CONFLICT (user_id, lower(name)) DO NOTHING
+    RETURNING id, name
+), found AS (
+    SELECT id, name, true AS created FROM inserted
+    UNION ALL
+    SELECT id, name, false FROM {table}
+    WHERE user_id = %(user_id)s
+    AND lower(name) IN (SELECT lower_name FROM wanted)
+)
+SELECT wanted.ord, found.id, found.name, found.created
+FROM wanted JOIN found ON lower(found.name) = wanted.lower_name
+'''
+
+# Names per lookup, each one is sent twice
+NAME_BATCH_SIZE = 400
+
+
+class NameManager(models.Manager):
+    """ Manager of the user owned, case-insensitively unique names"""
+
+    def _by_lower_name(self, user_id, names):
+        """ Return the user's objects matching the names by position
+
+        The comparison runs on the database's lower(), which is what the
+        unique index enforces and may fold case unlike Python.
+        """
+        found = {}
+        for start in range(0, len(names), NAME_BATCH_SIZE):
+            keys = [
+                Lower(Value(name))
+                for name in names[start:start + NAME_BATCH_SIZE]
+            ]
+            rows = self.annotate(lower_name=Lower('name')).filter(
+                user_id=user_id,
+                lower_name__in=keys
+            ).annotate(position=Case(
+                *(
+                    When(lower_name=key, then=Value(start + i))
+                    for i, key in enumerate(keys)
+                ),
+                output_field=models.IntegerField()
+            ))
+            for obj in rows:
+                found[obj.position] = obj
+        return found
+
+    def _upsert(self, user_id, names):
+        """ Insert and return names in one PostgreSQL round trip"""
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        found = {}
+        created = False
+        with connection.cursor() as cursor:
+            cursor.execute(UPSERT_NAMES_SQL.format(table=table), {
+                'user_id': user_id,
+                'names': names,
+            })
+            for position, pk, name, inserted in cursor.fetchall():
+                found[position - 1] = self.model.from_db(
+                    self.db,
+                    ('id', 'user_id', 'name'),
+                    (pk, user_id, name)
+                )
+                created = created or inserted
+        return found, created
+
+    def get_or_create_many(self, user_id, names):
+        """ Return the user's objects with the given names, creating the
+        missing ones
+
+        Names are stripped and matched case-insensitively, existing rows
+        keep their spelling. The objects follow the first occurrence of
+        each name. PostgreSQL resolves them with a single INSERT ... ON
+        CONFLICT, other databases with up to three queries.
+        """
+        wanted = {}
+        for name in names:
+            name = name.strip()
+            if name:
+                wanted.setdefault(name.lower(), name)
+        names = list(wanted.values())
+        if not names:
+            return []
+
+        if connections[self.db].vendor == 'postgresql':
+            found, created = self._upsert(user_id, names)
+        else:
+            found = self._by_lower_name(user_id, names)
+            created = len(found) < len(names)
+            self.bulk_create(
+                (
+                    self.model(user_id=user_id, name=name)
+                    for i, name in enumerate(names) if i not in found
+                ),
+                ignore_conflicts=True
+            )
+
+        missing = [i for i in range(len(names)) if i not in found]
+        if missing:
+            # Rows just inserted here, by a concurrent transaction, or
+            # shared with a name the database folds to the same key
+            rows = self._by_lower_name(user_id, [names[i] for i in missing])
+            found.update((missing[i], obj) for i, obj in rows.items())
+        if created:
+            CollectionVersion.bump(user_id)
+        # Names only the database considers equal resolve to one row
+        return list({
+            found[i].pk: found[i] for i in range(len(names)) if i in found
+        }.values())
+
+
 class Tag(models.Model):
     """ Tag for recipe """
     name = models.CharField(max_length=256)
@@ -55,6 +188,16 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    objects = NameManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='core_tag_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -66,12 +209,240 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
         )
 
+    objects = NameManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'name'],
+                name='core_ingredient_user_name_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 
+# Recomputes the PostgreSQL search vector of core_recipe rows, weighting
+# the title over tag names over ingredient names
+SEARCH_VECTOR_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, title), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(t.name, ' ') FROM core_tag t
+        JOIN core_recipe_tags rt ON rt.tag_id = t.id
+        WHERE rt.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(i.name, ' ') FROM core_ingredient i
+        JOIN core_recipe_ingredient ri ON ri.ingredient_id = i.id
+        WHERE ri.recipe_id = core_recipe.id
+    ), '')), 'C')
+WHERE id = ANY(%(ids)s)
+'''
+
+
+def search_config():
+    """ Return the PostgreSQL text search configuration of recipes"""
+    return setting_reader('RECIPE_SEARCH')('CONFIG', 'english')
+
+
+class RecipeManager(models.Manager):
+
+    def has_search_vector(self):
+        """ Return whether the database keeps a tsvector of recipes"""
+        return connections[self.db].vendor == 'postgresql'
+
+    def refresh_search(self, recipe_ids):
+        """ Recompute the search vector of the given recipes
+
+        Only PostgreSQL stores one, other databases search an index built
+        from the collection by recipe.search.
+        """
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids or not self.has_search_vector():
+            return
+
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                SEARCH_VECTOR_SQL,
+                {'config': search_config(), 'ids': recipe_ids}
+            )
+
+    def _insert_links(self, relation, rows):
+        """ Insert (recipe id, related id) rows into a through table
+
+        PostgreSQL loads them with COPY, other databases with batched
+        INSERTs. Either skips building a model instance per row.
+        """
+        through = getattr(self.model, relation).through
+        table = through._meta.db_table
+        column = getattr(self.model, relation).field.m2m_reverse_name()
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.copy_expert(
+                    f'COPY {table} (recipe_id, {column}) FROM STDIN',
+                    io.StringIO(''.join(
+                        f'{recipe_id}\t{related_id}\n'
+                        for recipe_id, related_id in rows
+                    ))
+                )
+                return
+
+            rows = iter(rows)
+            while True:
+                batch = list(itertools.islice(rows, 5000))
+                if not batch:
+                    return
+                cursor.executemany(
+                    f'INSERT INTO {table} (recipe_id, {column}) '
+                    'VALUES (%s, %s)',
+                    batch
+                )
+
+    def bulk_create_with_relations(self, recipes, tags, ingredients):
+        """ Insert recipes and their tag/ingredient links in batches
+
+        ``tags`` and ``ingredients`` hold one list of ids per recipe. Call
+        inside a transaction; M2M signals do not fire, so the collection
+        versions and summaries of the owners are updated here instead.
+        Recipes are saved one by one on databases that cannot return the
+        new ids, unless the caller numbered them, see core.bulk.
+        """
+        connection = connections[self.db]
+        # Recipes numbered by the caller need no ids returned either
+        bulk = connection.features.can_return_rows_from_bulk_insert or all(
+            recipe.pk is not None for recipe in recipes
+        )
+        if bulk:
+            recipes = self.bulk_create(recipes)
+        else:
+            # Without RETURNING the new primary keys are unknown
+            for recipe in recipes:
+                recipe.save(using=self.db)
+
+        self._insert_links('tags', (
+            (recipe.id, tag_id)
+            for recipe, tag_ids in zip(recipes, tags)
+            for tag_id in dict.fromkeys(tag_ids)
+        ))
+        self._insert_links('ingredient', (
+            (recipe.id, ingredient_id)
+            for recipe, ingredient_ids in zip(recipes, ingredients)
+            for ingredient_id in dict.fromkeys(ingredient_ids)
+        ))
+
+        self.refresh_search(recipe.id for recipe in recipes)
+        changes = {}
+        for recipe, tag_ids, ingredient_ids in zip(recipes, tags, ingredients):
+            user_changes = changes.setdefault(recipe.user_id, [])
+            if bulk:
+                # Saved recipes were already counted by post_save
+                user_changes += RecipeStat.recipe_changes(
+                    recipe.time_minute, recipe.price, 1
+                )
+            user_changes += [
+                (RecipeStat.TAG, pk, 1, 0, 0)
+                for pk in dict.fromkeys(tag_ids)
+            ] + [
+                (RecipeStat.INGREDIENT, pk, 1, 0, 0)
+                for pk in dict.fromkeys(ingredient_ids)
+            ]
+        for user_id, user_changes in changes.items():
+            RecipeStat.adjust(user_id, user_changes)
+            CollectionVersion.bump(user_id)
+        return recipes
+
+    def bulk_update_with_relations(self, recipes, fields, tags, ingredients):
+        """ Update recipes and replace their tag/ingredient links in batches
+
+        ``recipes`` are loaded instances holding the new values of
+        ``fields``. ``tags`` and ``ingredients`` hold one list of ids per
+        recipe, or None to keep its links. Call inside a transaction; like
+        bulk_create_with_relations no signal fires, the owners' collection
+        versions and summaries are updated here instead.
+        """
+        if fields:
+            self.bulk_update(recipes, fields)
+
+        changes = {}
+        invalid = set()
+        for recipe in recipes:
+            stats = (recipe.time_minute, recipe.price)
+            if None in recipe._loaded_stats:
+                invalid.add(recipe.user_id)
+            elif stats != recipe._loaded_stats:
+                changes.setdefault(recipe.user_id, []).extend(
+                    RecipeStat.recipe_changes(*recipe._loaded_stats, -1) +
+                    RecipeStat.recipe_changes(*stats, 1)
+                )
+            recipe._loaded_stats = stats
+
+        relinked = set()
+        for relation, kind, lists in (
+            ('tags', RecipeStat.TAG, tags),
+            ('ingredient', RecipeStat.INGREDIENT, ingredients),
+        ):
+            links = {
+                recipe.id: list(dict.fromkeys(ids))
+                for recipe, ids in zip(recipes, lists) if ids is not None
+            }
+            if not links:
+                continue
+
+            through = getattr(self.model, relation).through
+            column = getattr(self.model, relation).field.m2m_reverse_name()
+            rows = through.objects.filter(recipe_id__in=links)
+            previous = {}
+            for recipe_id, related_id in rows.values_list(
+                'recipe_id', column
+            ):
+                previous.setdefault(recipe_id, set()).add(related_id)
+            # Replacing every link takes two statements whatever changed
+            rows.delete()
+            self._insert_links(relation, (
+                (recipe_id, related_id)
+                for recipe_id, related_ids in links.items()
+                for related_id in related_ids
+            ))
+
+            for recipe in recipes:
+                if recipe.id not in links:
+                    continue
+                old = previous.get(recipe.id, set())
+                new = set(links[recipe.id])
+                changes.setdefault(recipe.user_id, []).extend(
+                    [(kind, pk, -1, 0, 0) for pk in old - new] +
+                    [(kind, pk, 1, 0, 0) for pk in new - old]
+                )
+            relinked.update(links)
+
+        if 'title' in fields:
+            relinked.update(recipe.id for recipe in recipes)
+        self.refresh_search(relinked)
+        for user_id in {recipe.user_id for recipe in recipes}:
+            if user_id in invalid:
+                RecipeStat.invalidate(user_id)
+            else:
+                RecipeStat.adjust(user_id, changes.get(user_id, []))
+            CollectionVersion.bump(user_id)
+        return recipes
+
+
 class Recipe(models.Model):
     """ Recipe Object"""
+    IMAGE_NONE = 'none'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_NONE, 'No image'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
@@ -83,6 +454,429 @@ class Recipe(models.Model):
     ingredient = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUS_CHOICES,
+        default=IMAGE_NONE
+    )
+
+    objects = RecipeManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'id'],
+                name='core_recipe_user_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class CollectionVersion(models.Model):
+    """ Per-user version of the recipes, tags and ingredients collection"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    version = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def current(cls, user_id):
+        """ Return the collection version of a user"""
+        collection, _ = cls.objects.get_or_create(user_id=user_id)
+        return collection.version
+
+    @classmethod
+    def bump(cls, user_id):
+        """ Invalidate every version handed out for the user
+
+        Rows only exist once a version was read, so users nobody asked
+        about cost nothing and deletes never create rows.
+        """
+        cls.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+@receiver(post_save, sender=User)
+def create_collection_version(sender, instance, created, **kwargs):
+    """ Start every new user's collection at version 0"""
+    if created:
+        CollectionVersion.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def bump_collection_version(sender, instance, **kwargs):
+    """ Bump the owner's collection version on any change"""
+    CollectionVersion.bump(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def bump_collection_version_m2m(sender, instance, action, **kwargs):
+    """ Bump the owner's collection version when recipe links change"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        CollectionVersion.bump(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search(sender, instance, update_fields=None, **kwargs):
+    """ Index the title of a saved recipe"""
+    if update_fields is None or 'title' in update_fields:
+        Recipe.objects.refresh_search([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def refresh_recipe_search_m2m(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """ Index the tag and ingredient names of relinked recipes"""
+    if not Recipe.objects.has_search_vector():
+        return
+
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Recipe.objects.refresh_search([instance.pk])
+    elif action == 'pre_clear':
+        # pk_set is not given on clear, remember the recipes beforehand
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        Recipe.objects.refresh_search(instance._search_recipe_ids)
+    elif action in ('post_add', 'post_remove'):
+        Recipe.objects.refresh_search(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_renamed_search(sender, instance, created, **kwargs):
+    """ Index the new name in every recipe of a tag or ingredient"""
+    if not created and Recipe.objects.has_search_vector():
+        Recipe.objects.refresh_search(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_deleted_search(sender, instance, **kwargs):
+    """ Remember the recipes whose links the delete cascades to"""
+    if Recipe.objects.has_search_vector():
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_deleted_search(sender, instance, **kwargs):
+    """ Drop a deleted tag or ingredient name from its recipes"""
+    Recipe.objects.refresh_search(getattr(instance, '_search_recipe_ids', ()))
+
+
+class ImageBlob(models.Model):
+    """ Reference count of a content-addressed image file"""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.IntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def adjust(cls, name, delta):
+        """ Add delta references to a content-addressed file name"""
+        if not name or not name.startswith(CAS_PREFIX):
+            return
+
+        updated = cls.objects.filter(name=name).update(
+            refs=F('refs') + delta,
+            updated=Now()
+        )
+        if not updated and delta > 0:
+            blob, created = cls.objects.get_or_create(
+                name=name,
+                defaults={'refs': delta}
+            )
+            if not created:
+                cls.objects.filter(name=name).update(refs=F('refs') + delta)
+
+    @classmethod
+    def reserve(cls, name):
+        """ Create or touch the row of a content-addressed file about to be
+        written, locking it until the current transaction ends
+
+        The garbage collector locks the rows of the files it deletes, so a
+        write either waits for the deletion and recreates the row, or holds
+        the row until the reference is counted in the same transaction.
+        """
+        while not cls.objects.filter(name=name).update(updated=Now()):
+            cls.objects.bulk_create([cls(name=name)], ignore_conflicts=True)
+
+
+def _image_name(value):
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Recipe)
+def remember_image_name(sender, instance, **kwargs):
+    """ Remember the loaded image to count references when it changes"""
+    # Read the raw value, deferred fields must not trigger a query
+    instance._loaded_image = _image_name(instance.__dict__.get('image'))
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, update_fields=None, **kwargs):
+    """ Move a reference from the previous image to the new one"""
+    if update_fields is not None and 'image' not in update_fields:
+        return
+
+    name = _image_name(instance.image)
+    if name != instance._loaded_image:
+        ImageBlob.adjust(name, 1)
+        ImageBlob.adjust(instance._loaded_image, -1)
+        instance._loaded_image = name
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image_reference(sender, instance, **kwargs):
+    """ Drop the reference of a deleted recipe"""
+    ImageBlob.adjust(instance._loaded_image, -1)
+
+
+_stats_setting = setting_reader('RECIPE_STATS')
+
+
+def price_buckets():
+    """ Return the upper bounds of the price histogram buckets"""
+    return tuple(_stats_setting('PRICE_BUCKETS', (5, 10, 20, 50)))
+
+
+def price_bucket(price):
+    """ Return the index of the histogram bucket of a price"""
+    return bisect.bisect_right(price_buckets(), Decimal(str(price)))
+
+
+class RecipeStat(models.Model):
+    """ Incrementally maintained summary of a user's recipes
+
+    The RECIPES row holds the number of recipes and their time and price
+    totals, PRICE rows the recipes per price bucket and TAG/INGREDIENT
+    rows the recipes per tag or ingredient id. Users only have rows once
+    their summary was built, signals then keep them current.
+    """
+    RECIPES = 'recipe'
+    PRICE = 'price'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=16)
+    key = models.IntegerField(default=0)
+    count = models.IntegerField(default=0)
+    time_minute_total = models.BigIntegerField(default=0)
+    price_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'kind', 'key'],
+                name='core_recipestat_user_kind_key_uniq'
+            ),
+        ]
+
+    @classmethod
+    def enabled(cls):
+        return _stats_setting('SUMMARY', False)
+
+    @classmethod
+    def recipe_changes(cls, time_minute, price, sign):
+        """ Return the changes of adding (1) or removing (-1) a recipe"""
+        return [
+            (
+                cls.RECIPES, 0, sign,
+                sign * time_minute, sign * Decimal(str(price))
+            ),
+            (cls.PRICE, price_bucket(price), sign, 0, 0),
+        ]
+
+    @classmethod
+    def adjust(cls, user_id, changes):
+        """ Apply (kind, key, count, time_minute, price) changes to the
+        summary of a user, if it has one"""
+        if not cls.enabled() or not cls.objects.filter(
+            user_id=user_id,
+            kind=cls.RECIPES
+        ).exists():
+            return
+
+        totals = {}
+        for kind, key, count, time_minute, price in changes:
+            total = totals.setdefault((kind, key), [0, 0, Decimal(0)])
+            total[0] += count
+            total[1] += time_minute
+            total[2] += price
+
+        for (kind, key), (count, time_minute, price) in totals.items():
+            rows = cls.objects.filter(user_id=user_id, kind=kind, key=key)
+            fields = {
+                'count': F('count') + count,
+                'time_minute_total': F('time_minute_total') + time_minute,
+                'price_total': F('price_total') + price,
+            }
+            if not rows.update(**fields):
+                _, created = cls.objects.get_or_create(
+                    user_id=user_id,
+                    kind=kind,
+                    key=key,
+                    defaults={
+                        'count': count,
+                        'time_minute_total': time_minute,
+                        'price_total': price,
+                    }
+                )
+                if not created:
+                    rows.update(**fields)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """ Drop a summary that cannot be adjusted, it is rebuilt on read"""
+        if cls.enabled():
+            cls.objects.filter(user_id=user_id).delete()
+
+    @classmethod
+    def store(cls, user_id, rows):
+        """ Save a freshly built summary unless another one won the race"""
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create(
+                    cls(user_id=user_id, kind=kind, key=key, count=count,
+                        time_minute_total=time_minute, price_total=price)
+                    for kind, key, count, time_minute, price in rows
+                )
+        except IntegrityError:
+            pass
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_stats(sender, instance, **kwargs):
+    """ Remember the loaded time and price to adjust the summary"""
+    instance._loaded_stats = (
+        instance.__dict__.get('time_minute'),
+        instance.__dict__.get('price'),
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def summarize_saved_recipe(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """ Count a new recipe or move a changed one between buckets"""
+    stats = (instance.time_minute, instance.price)
+    if created:
+        RecipeStat.adjust(
+            instance.user_id,
+            RecipeStat.recipe_changes(*stats, 1)
+        )
+    elif update_fields is None or {'time_minute', 'price'} & set(
+        update_fields
+    ):
+        if None in instance._loaded_stats:
+            RecipeStat.invalidate(instance.user_id)
+        elif stats != instance._loaded_stats:
+            RecipeStat.adjust(
+                instance.user_id,
+                RecipeStat.recipe_changes(*instance._loaded_stats, -1) +
+                RecipeStat.recipe_changes(*stats, 1)
+            )
+    instance._loaded_stats = stats
+
+
+def _stat_kind(sender):
+    if sender is Recipe.tags.through:
+        return RecipeStat.TAG
+    return RecipeStat.INGREDIENT
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def summarize_recipe_links(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """ Count the recipes gaining or losing a tag or ingredient"""
+    if not RecipeStat.enabled():
+        return
+
+    kind = _stat_kind(sender)
+    other = kind if not reverse else 'recipe'
+    if action in ('pre_clear', 'pre_remove'):
+        # pk_set is not given on clear, and on remove it holds every id
+        # passed in, linked or not: remember the actual links beforehand
+        links = sender.objects.filter(**{
+            ('recipe' if not reverse else kind): instance
+        })
+        if action == 'pre_remove':
+            links = links.filter(**{f'{other}__in': pk_set})
+        instance._stat_unlinked = list(links.values_list(other, flat=True))
+        return
+    elif action in ('post_clear', 'post_remove'):
+        pk_set = instance._stat_unlinked
+    elif action != 'post_add':
+        return
+
+    sign = -1 if action in ('post_remove', 'post_clear') else 1
+    if reverse:
+        changes = [(kind, instance.pk, sign * len(pk_set), 0, 0)]
+    else:
+        changes = [(kind, pk, sign, 0, 0) for pk in pk_set]
+    RecipeStat.adjust(instance.user_id, changes)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_links(sender, instance, **kwargs):
+    """ Remember the links the delete cascades to"""
+    instance._stat_links = []
+    if RecipeStat.enabled():
+        instance._stat_links = [
+            (RecipeStat.TAG, pk)
+            for pk in instance.tags.values_list('id', flat=True)
+        ] + [
+            (RecipeStat.INGREDIENT, pk)
+            for pk in instance.ingredient.values_list('id', flat=True)
+        ]
+
+
+@receiver(post_delete, sender=Recipe)
+def summarize_deleted_recipe(sender, instance, **kwargs):
+    """ Uncount a deleted recipe and its links"""
+    if None in instance._loaded_stats:
+        RecipeStat.invalidate(instance.user_id)
+        return
+
+    RecipeStat.adjust(
+        instance.user_id,
+        RecipeStat.recipe_changes(*instance._loaded_stats, -1) + [
+            (kind, pk, -1, 0, 0) for kind, pk in instance._stat_links
+        ]
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def summarize_deleted_name(sender, instance, **kwargs):
+    """ Drop the count of a deleted tag or ingredient"""
+    if RecipeStat.enabled():
+        RecipeStat.objects.filter(
+            user_id=instance.user_id,
+            kind=sender._meta.model_name,
+            key=instance.pk
+        ).delete()
@@ -0,0 +1,51 @@
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """ JSONRenderer writing bytes with orjson, when it is installed
+
+    Compact output is the same as JSONRenderer's: Decimal values become
+    floats like in DRF's JSONEncoder, which also encodes the datetimes
+    and the types orjson does not know. Indented output, and anything
+    orjson rejects, falls back to JSONRenderer.
+    """
+    _encoder = JSONEncoder()
+
+    @classmethod
+    def _default(cls, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return cls._encoder.default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or
+            self.ensure_ascii or not self.compact or
+            self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self._default,
+                option=(
+                    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                )
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Escaped by JSONRenderer so the output stays valid javascript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
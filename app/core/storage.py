@@ -0,0 +1,75 @@
+import hashlib
+import os
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+CAS_PREFIX = 'cas/'
+
+
+def file_digest(content):
+    """ Return the SHA-256 hex digest of a Django File"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ File system storage keying every file by the hash of its content
+
+    Files are stored as ``cas/ab/cd/<sha256>.<ext>``, so uploading the
+    same content twice writes it once and both names point at one file.
+    The ImageBlob table reference-counts the names so that files nobody
+    uses anymore can be garbage-collected. Writes reserve the ImageBlob
+    row first, callers saving the reference in the same transaction
+    cannot lose the file to the collector.
+    """
+
+    def hashed_name(self, digest, ext):
+        return f'{CAS_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}.{ext}'
+
+    def is_content_addressed(self, name):
+        return name.startswith(CAS_PREFIX)
+
+    def _reserve(self, name):
+        from .models import ImageBlob
+        ImageBlob.reserve(name)
+
+    def _save(self, name, content):
+        ext = os.path.splitext(name)[1].lstrip('.').lower()
+        name = self.hashed_name(file_digest(content), ext)
+        with transaction.atomic():
+            self._reserve(name)
+            if self.exists(name):
+                return name
+
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            with open(tmp, 'wb') as destination:
+                for chunk in content.chunks():
+                    destination.write(chunk)
+            # Concurrent uploads of the same content replace it atomically
+            os.replace(tmp, path)
+        return name
+
+    def adopt(self, name, digest):
+        """ Move a file already written under name to its hashed name"""
+        ext = os.path.splitext(name)[1].lstrip('.').lower()
+        hashed = self.hashed_name(digest, ext)
+        with transaction.atomic():
+            self._reserve(hashed)
+            if self.exists(hashed):
+                self.delete(name)
+            else:
+                os.makedirs(
+                    os.path.dirname(self.path(hashed)),
+                    exist_ok=True
+                )
+                os.replace(self.path(name), self.path(hashed))
+        return hashed
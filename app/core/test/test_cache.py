@@ -0,0 +1,51 @@
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from ..cache import LRUCache
+
+
+class LRUCacheTest(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        """ Test the oldest unused entry is evicted first"""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('time.monotonic')
+    def test_ttl_expires(self, monotonic):
+        """ Test entries expire after the TTL"""
+        monotonic.return_value = 100
+        cache = LRUCache(maxsize=2, ttl=10)
+        cache.set('a', 1)
+
+        monotonic.return_value = 105
+        self.assertEqual(cache.get('a'), 1)
+        monotonic.return_value = 111
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_evicts_by_size(self):
+        """ Test entries are evicted once maxbytes is exceeded"""
+        cache = LRUCache(maxsize=10, maxbytes=10, sizeof=len)
+        cache.set('a', 'xxxx')
+        cache.set('b', 'xxxx')
+        cache.set('a', 'xxxxx')
+        cache.set('c', 'xxxx')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'xxxxx')
+        self.assertEqual(cache.currbytes, 9)
+
+    def test_skips_oversized_values(self):
+        """ Test a value larger than maxbytes is not stored"""
+        cache = LRUCache(maxsize=10, maxbytes=3, sizeof=len)
+        cache.set('a', 'xxxx')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.currbytes, 0)
@@ -1,7 +1,48 @@
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count
 from django.db.utils import OperationalError
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.benchmark import seed_user
+from core.models import CollectionVersion, Ingredient, Recipe, Tag
+
+# Smoke runs of the bench_* commands: options and expected output labels
+BENCHMARKS = (
+    (
+        'bench_recipe_filters', {'recipes': 50},
+        ('match=any', 'match=all', "search='recipe'")
+    ),
+    (
+        'bench_image_pipeline',
+        {'images': 2, 'width': 64, 'height': 48, 'workers': '1'},
+        ('images/s/core',)
+    ),
+    (
+        'bench_media', {'size': 1024},
+        ('static.serve full', 'serve_media x-sendfile')
+    ),
+    (
+        'bench_autocomplete', {'names': 200},
+        ('database prefix', 'index fuzzy')
+    ),
+    (
+        'bench_recipe_fields', {'recipes': 30},
+        ('fields=id,title', 'expand=tags,ingredient')
+    ),
+    (
+        'bench_serializers', {'recipes': 30},
+        ('recipe list expanded', 'tag list')
+    ),
+    ('bench_rendering', {'recipes': [20]}, ('FastJSONRenderer', 'gzip')),
+)
 
 
 class CommandTest(TestCase):
@@ -20,3 +61,222 @@ class CommandTest(TestCase):
             gi.side_effect = [OperationalError] * 5 + [True]
             call_command('wait_for_db')
             self.assertEqual(gi.call_count, 6)
+
+    def test_explain_queries_seeded(self):
+        """ Test explaining every endpoint against seeded data"""
+        out = StringIO()
+        call_command('explain_queries', seed=20, stdout=out)
+
+        output = out.getvalue()
+        self.assertIn('tags assigned_only', output)
+        self.assertIn('recipes by ingredient', output)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_benchmarks(self):
+        """ Test every benchmark reports its cases and keeps no rows"""
+        for command, options, labels in BENCHMARKS:
+            with self.subTest(command):
+                out = StringIO()
+                call_command(command, repeat=1, stdout=out, **options)
+
+                for label in labels:
+                    self.assertIn(label, out.getvalue())
+                self.assertFalse(Recipe.objects.exists())
+                self.assertFalse(Tag.objects.exists())
+
+
+class ImportRecipesTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('import@gmail.com')
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def _import(self, path, **options):
+        out = StringIO()
+        call_command(
+            'import_recipes', path, email=self.user.email, stdout=out,
+            **options
+        )
+        return out.getvalue()
+
+    def test_import_ndjson(self):
+        """ Test NDJSON recipes are imported with their tags and ingredients"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        version = CollectionVersion.current(self.user.pk)
+        lines = [json.dumps(item) + '\n' for item in (
+            {'title': 'Salad', 'time_minute': 5, 'price': '4.50',
+             'tags': ['vegan', 'Quick'], 'ingredient': ['Kale']},
+            {'title': 'Soup', 'time_minute': 30, 'price': 6,
+             'tags': [{'id': 99, 'name': 'Quick'}], 'link': 'https://a.b'},
+        )]
+        path = self._file('recipes.ndjson', ''.join(lines))
+
+        output = self._import(path, batch_size=1)
+
+        self.assertIn('2 recipes imported', output)
+        salad = Recipe.objects.get(user=self.user, title='Salad')
+        self.assertEqual(
+            sorted(salad.tags.values_list('name', flat=True)),
+            ['Quick', 'Vegan']
+        )
+        self.assertEqual(
+            list(salad.ingredient.values_list('name', flat=True)),
+            ['Kale']
+        )
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(str(soup.price), '6.00')
+        self.assertEqual(soup.link, 'https://a.b')
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertNotEqual(CollectionVersion.current(self.user.pk), version)
+
+    def test_import_csv_export(self):
+        """ Test a CSV recipe export imports back into another account"""
+        other = get_user_model().objects.create_user('other@gmail.com')
+        recipe = Recipe.objects.create(
+            user=other, title='Stew', time_minute=60, price='12.00'
+        )
+        recipe.tags.add(Tag.objects.create(user=other, name='Dinner, hot'))
+        recipe.ingredient.add(
+            Ingredient.objects.create(user=other, name='Beef')
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+        res = client.get(reverse('recipe:recipe-export'), {'output': 'csv'})
+        path = self._file(
+            'export.csv',
+            b''.join(res.streaming_content).decode()
+        )
+
+        self._import(path)
+
+        imported = Recipe.objects.get(user=self.user)
+        self.assertEqual(imported.title, 'Stew')
+        self.assertEqual(
+            list(imported.tags.values_list('name', flat=True)),
+            ['Dinner, hot']
+        )
+        self.assertEqual(imported.ingredient.get().name, 'Beef')
+
+    def test_import_invalid_line(self):
+        """ Test a malformed recipe reports its line"""
+        path = self._file(
+            'recipes.ndjson',
+            '{"title": "Salad", "time_minute": 5, "price": "4"}\n'
+            '{"title": "Soup", "price": "4"}\n'
+        )
+
+        with self.assertRaisesMessage(CommandError, 'Line 2'):
+            self._import(path)
+
+    def test_import_invalid_values(self):
+        """ Test values the recipe columns cannot hold report their line"""
+        for record in (
+            {'title': 'Salad', 'time_minute': 5, 'price': '12345.678'},
+            {'title': 'Salad', 'time_minute': 5, 'price': 'NaN'},
+            {'title': 'S' * 300, 'time_minute': 5, 'price': '4'},
+        ):
+            path = self._file('recipes.ndjson', json.dumps(record))
+
+            with self.assertRaisesMessage(CommandError, 'Line 1'):
+                self._import(path)
+
+    def test_import_all_or_nothing(self):
+        """ Test a bad line keeps the batches before it out as well"""
+        path = self._file(
+            'recipes.ndjson',
+            '{"title": "Salad", "time_minute": 5, "price": "4"}\n'
+            '{"title": "Soup", "time_minute": 5, "price": "4", '
+            '"tags": ["Quick"]}\n'
+            '{"title": "Stew", "time_minute": 5, "price": "NaN"}\n'
+        )
+
+        with self.assertRaisesMessage(CommandError, 'Line 3'):
+            self._import(path, batch_size=1)
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_import_unknown_format(self):
+        """ Test files without a known extension need --format"""
+        path = self._file('recipes.txt', '')
+
+        with self.assertRaises(CommandError):
+            self._import(path)
+        self.assertIn('0 recipes imported', self._import(path, format='csv'))
+
+
+class BenchmarkDataTest(TestCase):
+
+    def test_seed_data(self):
+        """ Test seeding skewed collections with Zipfian tag usage"""
+        out = StringIO()
+        call_command(
+            'seed_data', users=3, min_recipes=10, max_recipes=1000,
+            tags=20, stdout=out
+        )
+
+        counts = [
+            Recipe.objects.filter(user__email=f'seed-{i}@example.com').count()
+            for i in range(3)
+        ]
+        self.assertEqual(counts, [10, 100, 1000])
+        usage = sorted(
+            Recipe.tags.through.objects.filter(
+                recipe__user__email='seed-2@example.com'
+            ).values('tag').annotate(uses=Count('id')).values_list(
+                'uses', flat=True
+            ),
+            reverse=True
+        )
+        self.assertEqual(len(usage), 20)
+        self.assertGreater(usage[0], 5 * usage[-1])
+        self.assertIn('1110 recipes seeded', out.getvalue())
+
+    def test_seed_user(self):
+        """ Test a seeded user's recipes are linked and counted"""
+        user = seed_user('seeded@example.com', 30)
+
+        recipes = Recipe.objects.filter(user=user)
+        self.assertEqual(recipes.count(), 30)
+        self.assertEqual(
+            Recipe.tags.through.objects.filter(recipe__user=user).count(),
+            30 * 3
+        )
+        self.assertGreater(CollectionVersion.current(user.pk), 0)
+
+    def test_benchmark_api_baseline(self):
+        """ Test the API benchmark writes a baseline and flags regressions"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            out = StringIO()
+            call_command(
+                'benchmark_api', seed_users=1, max_recipes=20, repeat=1,
+                baseline=path, write_baseline=True, stdout=out
+            )
+            self.assertIn('recipes page', out.getvalue())
+            self.assertIn('user token', out.getvalue())
+            self.assertFalse(Recipe.objects.exists())
+
+            with open(path) as f:
+                baseline = json.load(f)
+            result = baseline['20 recipes recipes page']
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50'], result['p99'])
+
+            result['queries'] -= 1
+            with open(path, 'w') as f:
+                json.dump(baseline, f)
+            with self.assertRaisesMessage(CommandError, '1 regressions'):
+                call_command(
+                    'benchmark_api', seed_users=1, max_recipes=20, repeat=1,
+                    baseline=path, tolerance=100, stdout=StringIO()
+                )
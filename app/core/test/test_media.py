@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import uuid
+from django.test import TestCase, override_settings
+
+
+class ServeMediaTest(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+        self.stem = str(uuid.uuid4())
+        self.url = f'/media/uploads/{self.stem}.jpg'
+        self.content = bytes(range(256)) * 4
+        os.makedirs(os.path.join(self.media, 'uploads'))
+        for name in ('plain.bin', f'{self.stem}.jpg'):
+            with open(os.path.join(self.media, 'uploads', name), 'wb') as f:
+                f.write(self.content)
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media)
+
+    def test_serve_immutable(self):
+        """ Test a uuid named file is served with long-lived caching"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), self.content)
+        self.assertEqual(res['ETag'], f'"{self.stem}"')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Content-Length'], str(len(self.content)))
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_serve_plain_name(self):
+        """ Test other names are served with a revalidated ETag"""
+        res = self.client.get('/media/uploads/plain.bin')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Cache-Control'], 'public, no-cache')
+        self.assertNotEqual(res['ETag'], '"plain"')
+
+    def test_not_modified(self):
+        """ Test a matching If-None-Match returns 304"""
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'"{self.stem}"')
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_range(self):
+        """ Test single byte ranges return partial content"""
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-4', 1020, 1023),
+            ('bytes=1020-5000', 1020, 1023),
+        ):
+            res = self.client.get(self.url, HTTP_RANGE=header)
+
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(
+                b''.join(res.streaming_content),
+                self.content[start:end + 1]
+            )
+            self.assertEqual(res['Content-Range'], f'bytes {start}-{end}/1024')
+            self.assertEqual(res['Content-Length'], str(end - start + 1))
+
+    def test_range_unsatisfiable(self):
+        """ Test ranges past the end of the file return 416"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */1024')
+
+    def test_range_ignored(self):
+        """ Test stale If-Range and multiple ranges return the whole file"""
+        for headers in (
+            {'HTTP_RANGE': 'bytes=0-9', 'HTTP_IF_RANGE': '"stale"'},
+            {'HTTP_RANGE': 'bytes=0-9,20-29'},
+        ):
+            res = self.client.get(self.url, **headers)
+
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(b''.join(res.streaming_content), self.content)
+
+    def test_missing_and_traversal(self):
+        """ Test missing files and paths outside MEDIA_ROOT return 404"""
+        for url in (
+            '/media/uploads/missing.jpg',
+            '/media/uploads',
+            '/media/../settings.py',
+            '/media/%2E%2E/%2E%2E/etc/passwd',
+        ):
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, 404)
+
+    def test_sendfile_offload(self):
+        """ Test the body is left to the front server when configured"""
+        with self.settings(MEDIA_SERVING={'SENDFILE': 'x-accel-redirect'}):
+            res = self.client.get(self.url)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/uploads/{self.stem}.jpg'
+        )
+        self.assertEqual(res.content, b'')
+
+        with self.settings(MEDIA_SERVING={'SENDFILE': 'x-sendfile'}):
+            res = self.client.get(self.url)
+        self.assertEqual(
+            res['X-Sendfile'],
+            os.path.join(self.media, 'uploads', f'{self.stem}.jpg')
+        )
+        self.assertEqual(res['ETag'], f'"{self.stem}"')
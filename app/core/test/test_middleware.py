@@ -0,0 +1,202 @@
+import gzip
+import json
+from unittest import skipIf
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.instrumentation import fingerprint
+from core.middleware import CompressionMiddleware, RequestTimingMiddleware, \
+                            brotli, negotiate_encoding, supported_codings
+from core.models import Recipe
+
+BODY = b'{"title":"Recipe"}' * 200
+
+
+class CompressionMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _process(self, response, accept='gzip'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiate(self):
+        """ Test the accepted coding with the highest quality is chosen"""
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate_encoding('*'), supported_codings()[0])
+        self.assertIsNone(negotiate_encoding('gzip;q=0, deflate'))
+        self.assertIsNone(negotiate_encoding('*;q=0'))
+        self.assertIsNone(negotiate_encoding(''))
+
+    def test_compress(self):
+        """ Test a large JSON body is compressed"""
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+        res = self._process(response)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), BODY)
+        self.assertEqual(res['Content-Length'], str(len(res.content)))
+        self.assertEqual(res['ETag'], 'W/"abc"')
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        """ Test brotli is preferred when the client accepts it"""
+        res = self._process(
+            HttpResponse(BODY, content_type='application/json'),
+            accept='gzip, br'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(res.content), BODY)
+
+    def test_not_accepted(self):
+        """ Test the body is left alone for clients not accepting gzip"""
+        res = self._process(
+            HttpResponse(BODY, content_type='application/json'),
+            accept='identity'
+        )
+
+        self.assertFalse(res.has_header('Content-Encoding'))
+        self.assertEqual(res.content, BODY)
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_skipped(self):
+        """ Test small, partial, binary and HTML bodies are not compressed"""
+        partial = HttpResponse(BODY, status=206, content_type='text/plain')
+        for response in (
+            HttpResponse(b'{}', content_type='application/json'),
+            HttpResponse(BODY, content_type='image/jpeg'),
+            HttpResponse(BODY, content_type='text/html'),
+            partial,
+        ):
+            res = self._process(response)
+
+            self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        """ Test each streamed chunk is flushed as it is compressed"""
+        chunks = [b'{"id":%d}\n' % i for i in range(3)]
+        response = StreamingHttpResponse(
+            iter(chunks),
+            content_type='application/x-ndjson'
+        )
+        res = self._process(response)
+        streamed = list(res.streaming_content)
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertFalse(res.has_header('Content-Length'))
+        self.assertEqual(len(streamed), len(chunks) + 1)
+        self.assertEqual(gzip.decompress(b''.join(streamed)), b''.join(chunks))
+
+    def test_api_response(self):
+        """ Test API responses are compressed by the middleware"""
+        user = get_user_model().objects.create_user('gzip@gmail.com')
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minute=5, price=5)
+            for i in range(50)
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(
+            reverse('recipe:recipe-list'),
+            HTTP_ACCEPT='application/json',
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        body = json.loads(gzip.decompress(res.content))
+        self.assertEqual(len(body['results']), 50)
+
+
+@override_settings(REQUEST_TIMING={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': True})
+class RequestTimingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'timing@gmail.com',
+            'Signup!23'
+        )
+        self.factory = RequestFactory()
+
+    def _process(self, view):
+        def get_response(request):
+            view()
+            return HttpResponse(b'{}', content_type='application/json')
+
+        return RequestTimingMiddleware(get_response)(self.factory.get('/'))
+
+    def test_fingerprint(self):
+        """ Test literals and IN lists do not distinguish queries"""
+        self.assertEqual(
+            fingerprint('SELECT "a" FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            fingerprint("SELECT \"a\" FROM \"t\" WHERE \"id\" IN (%s)")
+        )
+        self.assertEqual(
+            fingerprint("SELECT 1 FROM t  WHERE name = 'it''s' LIMIT 21"),
+            'SELECT ? FROM t WHERE name = ? LIMIT ?'
+        )
+
+    def test_api_response(self):
+        """ Test instrumented views report queries, serialization and
+        rendering"""
+        Recipe.objects.create(
+            user=self.user,
+            title='Recipe',
+            time_minute=5,
+            price=5
+        )
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            res = client.get(reverse('recipe:recipe-list'))
+
+        timing = res['Server-Timing']
+        for name in ('db', 'serialize', 'render', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(record['path'], reverse('recipe:recipe-list'))
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertIn(f'desc="{record["queries"]} queries"', timing)
+        self.assertNotIn('duplicates', record)
+
+    def test_duplicate_queries(self):
+        """ Test a query repeated once per object is flagged"""
+        def view():
+            for pk in range(12):
+                Recipe.objects.filter(pk=pk).exists()
+
+        with self.assertLogs('core.instrumentation', 'INFO') as logs:
+            self._process(view)
+
+        self.assertEqual(logs.records[0].levelname, 'WARNING')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'], 12)
+        self.assertEqual(len(record['duplicates']), 1)
+        self.assertEqual(record['duplicates'][0]['count'], 12)
+        self.assertIn('core_recipe', record['duplicates'][0]['sql'])
+
+    @override_settings(REQUEST_TIMING={'SAMPLE_RATE': 0})
+    def test_not_sampled(self):
+        """ Test requests left out of the sample are not measured"""
+        res = self._process(lambda: Recipe.objects.exists())
+
+        self.assertFalse(res.has_header('Server-Timing'))
+
+    @override_settings(
+        REQUEST_TIMING={'SAMPLE_RATE': 1.0, 'SERVER_TIMING': False}
+    )
+    def test_log_only(self):
+        """ Test the header can be turned off while logging"""
+        with self.assertLogs('core.instrumentation', 'INFO'):
+            res = self._process(lambda: Recipe.objects.exists())
+
+        self.assertFalse(res.has_header('Server-Timing'))
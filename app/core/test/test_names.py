@@ -0,0 +1,117 @@
+import importlib
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from recipe.serializers import TagSerializer
+from unittest.mock import patch
+from ..models import CollectionVersion, Ingredient, Recipe, Tag
+
+merge_migration = importlib.import_module(
+    'core.migrations.0014_unique_lower_names'
+)
+
+
+class UniqueNameTest(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'names@ravenours.com',
+            'Signup!23'
+        )
+
+    def test_names_unique_ignoring_case(self):
+        """ Test a user cannot have two tags differing only by case"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        other = get_user_model().objects.create_user(
+            'other@ravenours.com',
+            'Signup!23'
+        )
+        Tag.objects.create(user=other, name='Vegan')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Tag.objects.create(user=self.user, name='VEGAN')
+
+    def test_get_or_create_many(self):
+        """ Test names resolve to existing or new rows, in order"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        version = CollectionVersion.current(self.user.pk)
+
+        tags = Tag.objects.get_or_create_many(
+            self.user.pk,
+            ['dessert', ' VEGAN ', 'Dessert', '']
+        )
+
+        self.assertEqual([tag.name for tag in tags], ['dessert', 'Vegan'])
+        self.assertEqual(tags[1].pk, vegan.pk)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertGreater(CollectionVersion.current(self.user.pk), version)
+
+    def test_get_or_create_many_existing(self):
+        """ Test resolving existing names does not touch the collection"""
+        Ingredient.objects.create(user=self.user, name='Salt')
+        version = CollectionVersion.current(self.user.pk)
+
+        with self.assertNumQueries(1):
+            ingredients = Ingredient.objects.get_or_create_many(
+                self.user.pk,
+                ['salt']
+            )
+
+        self.assertEqual(ingredients[0].name, 'Salt')
+        self.assertEqual(CollectionVersion.current(self.user.pk), version)
+
+    def test_get_or_create_many_database_case(self):
+        """ Test names are matched like the database folds case, which
+        may differ from Python"""
+        spice = Ingredient.objects.create(user=self.user, name='Épice')
+
+        ingredients = Ingredient.objects.get_or_create_many(
+            self.user.pk,
+            ['ÉPICE', 'épice']
+        )
+
+        self.assertIn(spice, ingredients)
+        self.assertEqual(
+            len(ingredients),
+            Ingredient.objects.filter(user=self.user).count()
+        )
+
+    def test_create_concurrent_duplicate(self):
+        """ Test a duplicate slipping past validation is a bad request"""
+        Tag.objects.create(user=self.user, name='Vegan')
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        # As if the other request inserted it after validation
+        with patch.object(TagSerializer, 'validate_name', lambda s, v: v):
+            res = client.post(reverse('recipe:tag-list'), {'name': 'vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data)
+
+    def test_merge_duplicate_names(self):
+        """ Test the migration merges duplicates and their recipe links"""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX core_tag_user_lower_name_uniq')
+        kept = Tag.objects.create(user=self.user, name='Vegan')
+        duplicate = Tag.objects.create(user=self.user, name='vegan')
+        both = Recipe.objects.create(
+            user=self.user, title='Salad', time_minute=5, price=3
+        )
+        both.tags.add(kept, duplicate)
+        moved = Recipe.objects.create(
+            user=self.user, title='Curry', time_minute=5, price=3
+        )
+        moved.tags.add(duplicate)
+        version = CollectionVersion.current(self.user.pk)
+
+        merge_migration.merge_duplicate_names(apps, None)
+
+        self.assertEqual(list(Tag.objects.all()), [kept])
+        self.assertEqual(list(both.tags.all()), [kept])
+        self.assertEqual(list(moved.tags.all()), [kept])
+        self.assertGreater(CollectionVersion.current(self.user.pk), version)
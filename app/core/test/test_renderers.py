@@ -0,0 +1,42 @@
+import datetime
+import uuid
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from core.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTest(TestCase):
+    """ Test the fast renderer writes the same bytes as JSONRenderer"""
+
+    def test_same_output(self):
+        """ Test types orjson and DRF's encoder handle are rendered alike"""
+        now = timezone.now()
+        for data in (
+            {'id': 1, 'title': 'Crème brûlée', 'price': '5.50'},
+            [{'price': Decimal('5.50')}, {'price': Decimal('10')}],
+            {'created': now, 'day': now.date(), 'at': datetime.time(8, 30)},
+            {'uid': uuid.uuid4(), 'lazy': gettext_lazy('Salad')},
+            {1: 'int key', 'nested': {'list': (1, 2.5, None, True)}},
+            {'separator': 'line paragraph '},
+            [],
+        ):
+            self.assertEqual(
+                FastJSONRenderer().render(data),
+                JSONRenderer().render(data)
+            )
+
+    def test_indent(self):
+        """ Test indented output is left to JSONRenderer"""
+        data = {'id': 1, 'tags': [1, 2]}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4')
+        )
+
+    def test_none(self):
+        """ Test an empty body is rendered for no data"""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from ..models import ImageBlob, Recipe
+from ..storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTest(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.media)
+
+    def tearDown(self):
+        shutil.rmtree(self.media)
+
+    def test_default_storage(self):
+        """ Test uploads are stored content addressed by default"""
+        self.assertIsInstance(default_storage, ContentAddressedStorage)
+
+    def test_save_dedupes_content(self):
+        """ Test the same content is stored once under its hash"""
+        first = self.storage.save('a.jpg', ContentFile(b'same'))
+        second = self.storage.save('b.JPG', ContentFile(b'same'))
+        other = self.storage.save('c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('cas/'))
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            self.storage.path(first)
+        ))), 1)
+
+    def test_adopt_moves_and_dedupes(self):
+        """ Test adopting a written file moves it to its hashed name"""
+        stored = self.storage.save('a.png', ContentFile(b'data'))
+        plain = FileSystemStorage(location=self.media)
+        written = plain.save('uploads/b.png', ContentFile(b'data'))
+        digest = os.path.basename(stored).split('.')[0]
+
+        adopted = self.storage.adopt(written, digest)
+
+        self.assertEqual(adopted, stored)
+        self.assertFalse(plain.exists(written))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='core.storage.ContentAddressedStorage'
+)
+class ImageReferenceTest(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media)
+        self.override.enable()
+        self.user = get_user_model().objects.create_user(
+            'blob@ravenours.com',
+            'Signup!23'
+        )
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media)
+
+    def _recipe(self, content=None):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Bread',
+            time_minute=60,
+            price=2.00
+        )
+        if content is not None:
+            recipe.image.save('photo.jpg', ContentFile(content))
+        return recipe
+
+    def test_references_counted(self):
+        """ Test references follow recipes using the same image"""
+        first = self._recipe(b'photo')
+        second = self._recipe(b'photo')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refs, 2)
+
+        second.image.save('new.jpg', ContentFile(b'new photo'))
+        Recipe.objects.get(pk=first.pk).delete()
+
+        self.assertEqual(ImageBlob.objects.get(name=first.image.name).refs, 0)
+        self.assertEqual(ImageBlob.objects.get(name=second.image.name).refs, 1)
+
+    def test_backfill_and_collect(self):
+        """ Test backfilling dedupes uuid named files and collects orphans"""
+        plain = FileSystemStorage()
+        names = [
+            plain.save(f'uploads/recipe/{i}.jpg', ContentFile(b'x' * 100))
+            for i in range(3)
+        ]
+        recipes = [self._recipe() for _ in names]
+        for recipe, name in zip(recipes, names):
+            Recipe.objects.filter(pk=recipe.pk).update(image=name)
+        orphan = self._recipe(b'orphan')
+        orphan.delete()
+
+        out = StringIO()
+        call_command(
+            'backfill_image_store', gc=True, gc_grace=-60, stdout=out
+        )
+
+        hashed = {recipe.image.name for recipe in Recipe.objects.all()}
+        self.assertEqual(len(hashed), 1)
+        self.assertTrue(default_storage.exists(hashed.pop()))
+        for name in names:
+            self.assertFalse(plain.exists(name))
+        self.assertFalse(ImageBlob.objects.filter(refs__lte=0).exists())
+        self.assertIn('1 images moved, 2 duplicates removed', out.getvalue())
+        self.assertIn('206 bytes reclaimed', out.getvalue())
+
+    def test_collect_spares_rewritten_blob(self):
+        """ Test a stale orphan written again before collection is kept"""
+        orphan = self._recipe(b'orphan')
+        name = orphan.image.name
+        orphan.delete()
+        ImageBlob.objects.filter(name=name).update(
+            updated=timezone.now() - timedelta(hours=2)
+        )
+
+        stored = default_storage.save('again.jpg', ContentFile(b'orphan'))
+        call_command('backfill_image_store', gc=True, stdout=StringIO())
+
+        self.assertEqual(stored, name)
+        self.assertTrue(default_storage.exists(name))
+        self.assertTrue(ImageBlob.objects.filter(name=name).exists())
+
+    def test_collect_needs_blob_row(self):
+        """ Test stored files without a reference count row are kept"""
+        stored = default_storage.save('photo.jpg', ContentFile(b'photo'))
+        ImageBlob.objects.filter(name=stored).delete()
+
+        call_command(
+            'backfill_image_store', gc=True, gc_grace=-60, stdout=StringIO()
+        )
+
+        self.assertTrue(default_storage.exists(stored))
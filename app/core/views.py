@@ -0,0 +1,157 @@
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_safe
+from .conf import setting_reader
+
+# Names that can never point at other content: content hashes written by
+# core.storage and uuid upload names, optionally with a rendition suffix
+IMMUTABLE_NAME = re.compile(
+    r'^(?:[0-9a-f]{64}|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12})(?:_\w+)?$'
+)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+_media_setting = setting_reader('MEDIA_SERVING')
+
+
+def _etag(path, stat):
+    """ Return a strong ETag and whether the file can be cached forever"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if IMMUTABLE_NAME.match(stem):
+        return quote_etag(stem), True
+
+    return quote_etag(f'{int(stat.st_mtime_ns):x}-{stat.st_size:x}'), False
+
+
+def _parse_range(header, size):
+    """ Return the (start, end) of a single byte range, None to serve the
+    whole file, or False when the range cannot be satisfied"""
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges, the full body is a valid answer
+        return None
+
+    start, end = match.groups()
+    if not start:
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+class _RangeFile:
+    """ File object reading at most length bytes from its current offset
+
+    Exposes fileno so WSGI servers offloading a FileResponse with
+    os.sendfile start from the seeked offset and stop at Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """ Serve an uploaded file with validators, ranges and offloading
+
+    MEDIA_SERVING['SENDFILE'] hands the body to the front server with an
+    'x-sendfile' or 'x-accel-redirect' header, otherwise the file is
+    streamed with a FileResponse that WSGI servers send with sendfile.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('File not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('File not found')
+
+    etag, immutable = _etag(fullpath, stat)
+    if immutable:
+        cache_control = (
+            f'public, max-age={_media_setting("MAX_AGE", 31536000)}, '
+            'immutable'
+        )
+    else:
+        cache_control = 'public, no-cache'
+    content_type = (
+        mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    )
+
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = HttpResponse(status=304)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    sendfile = _media_setting('SENDFILE', None)
+    if sendfile:
+        # The front server handles Range and the transfer itself
+        response = HttpResponse(content_type=content_type)
+        if sendfile == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = (
+                _media_setting('ACCEL_PREFIX', '/protected-media/') + path
+            )
+        else:
+            response['X-Sendfile'] = fullpath
+    else:
+        byte_range = None
+        if 'Range' in request.headers and request.headers.get(
+            'If-Range', etag
+        ) == etag:
+            byte_range = _parse_range(request.headers['Range'], stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+        start, end = byte_range or (0, stat.st_size - 1)
+        length = end - start + 1
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=content_type)
+        else:
+            file = open(fullpath, 'rb')
+            file.seek(start)
+            response = FileResponse(
+                _RangeFile(file, length),
+                content_type=content_type
+            )
+        if byte_range:
+            response.status_code = 206
+            response['Content-Range'] = (
+                f'bytes {start}-{end}/{stat.st_size}'
+            )
+        response['Content-Length'] = length
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,179 @@
+import bisect
+import heapq
+import re
+from collections import Counter, defaultdict
+from django.db import connections, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower
+from core.cache import LRUCache
+from core.conf import setting_reader
+from core.models import CollectionVersion
+
+# pg_trgm splits words on anything that is not alphanumeric
+WORD = re.compile(r'[^\W_]+')
+
+
+_autocomplete_setting = setting_reader('RECIPE_AUTOCOMPLETE')
+
+
+def trigrams(text):
+    """ Return the trigrams pg_trgm extracts from text"""
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameIndex:
+    """ In-memory autocomplete index of a user's tag or ingredient names
+
+    Prefixes are looked up in the sorted lowercase names, a flattened
+    trie where every prefix is one contiguous range found by bisection.
+    Fuzzy matches are scored on the trigrams shared with the query, like
+    pg_trgm's word similarity.
+    """
+
+    def __init__(self, rows):
+        self.names = dict(rows)
+        entries = sorted(
+            (name.lower(), pk) for pk, name in self.names.items()
+        )
+        self.keys = [key for key, _ in entries]
+        self.ids = [pk for _, pk in entries]
+        self.postings = defaultdict(list)
+        for pk, name in self.names.items():
+            for gram in trigrams(name):
+                self.postings[gram].append(pk)
+
+    def prefix(self, prefix, limit):
+        """ Return the ids of the first names starting with prefix"""
+        prefix = prefix.lower()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        return self.ids[start:min(end, start + limit)]
+
+    def similar(self, query, limit, threshold):
+        """ Return the ids of the names most similar to query"""
+        wanted = trigrams(query)
+        if not wanted:
+            return []
+
+        shared = Counter()
+        for gram in wanted:
+            shared.update(self.postings.get(gram, ()))
+        minimum = threshold * len(wanted)
+        return heapq.nlargest(
+            limit,
+            (pk for pk, count in shared.items() if count >= minimum),
+            key=lambda pk: (shared[pk], -len(self.names[pk]), -pk)
+        )
+
+
+_indexes = LRUCache(_autocomplete_setting('CACHE_SIZE', 64))
+_requests = LRUCache(_autocomplete_setting('CACHE_SIZE', 64) * 16)
+
+
+def _has_trigrams(db):
+    return connections[db].vendor == 'postgresql'
+
+
+def get_name_index(model, user_id, force=False):
+    """ Return the name index of the user's current tags or ingredients
+
+    On PostgreSQL indexes are only built once a user sent HOT_AFTER
+    requests since the collection last changed, cold users are served
+    by the pg_trgm index. Returns None while the user is cold.
+    """
+    key = (model._meta.label, user_id)
+    version = CollectionVersion.current(user_id)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    if not force:
+        seen_version, count = _requests.get(key, (version, 0))
+        count = count + 1 if seen_version == version else 1
+        _requests.set(key, (version, count))
+        if count < _autocomplete_setting('HOT_AFTER', 3):
+            return None
+
+    index = NameIndex(
+        model.objects.filter(user_id=user_id).values_list('id', 'name')
+    )
+    _indexes.set(key, (version, index))
+    return index
+
+
+def clear_name_indexes():
+    _indexes.clear()
+    _requests.clear()
+
+
+def _ordered(model, user_id, index, ids):
+    return [model(id=pk, name=index.names[pk], user_id=user_id) for pk in ids]
+
+
+def autocomplete(queryset, user_id, prefix=None, query=None, limit=None,
+                 use_index=True):
+    """ Return the top tags or ingredients completing a prefix or query
+
+    Answers come from the in-memory NameIndex of hot users, as unsaved
+    instances, or else from the database: pg_trgm on PostgreSQL and a
+    case-insensitive LIKE elsewhere. use_index=False forces the latter,
+    for querysets narrowed or annotated beyond the user's names. limit
+    defaults to RECIPE_AUTOCOMPLETE['LIMIT'], up to 'MAX_LIMIT'.
+    """
+    model = queryset.model
+    limit = max(1, min(
+        limit or _autocomplete_setting('LIMIT', 10),
+        _autocomplete_setting('MAX_LIMIT', 50)
+    ))
+    threshold = _autocomplete_setting('THRESHOLD', 0.6)
+    trgm = _has_trigrams(queryset.db)
+    if use_index:
+        index = get_name_index(model, user_id, force=not trgm)
+        if index is not None:
+            if prefix:
+                ids = index.prefix(prefix, limit)
+            else:
+                ids = index.similar(query, limit, threshold)
+            return _ordered(model, user_id, index, ids)
+
+    table = model._meta.db_table
+    if prefix:
+        if not trgm:
+            queryset = queryset.filter(name__istartswith=prefix)
+        else:
+            # ILIKE, unlike Django's UPPER() LIKE, can use the trigram index
+            pattern = re.sub(r'([\\%_])', r'\\\1', prefix) + '%'
+            queryset = queryset.filter(RawSQL(
+                f'{table}.name ILIKE %s',
+                (pattern,),
+                output_field=BooleanField()
+            ))
+        return queryset.order_by(Lower('name'), 'id')[:limit]
+
+    if not trgm:
+        queryset = queryset.filter(name__icontains=query)
+        return queryset.order_by(Lower('name'), 'id')[:limit]
+
+    # <% filters on pg_trgm.word_similarity_threshold, 0.6 unless set, so
+    # it is set to THRESHOLD for this transaction to agree with NameIndex
+    with transaction.atomic(using=queryset.db):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config("
+                "'pg_trgm.word_similarity_threshold', %s, true)",
+                (str(threshold),)
+            )
+        return list(queryset.filter(RawSQL(
+            f'%s <%% {table}.name',
+            (query,),
+            output_field=BooleanField()
+        )).annotate(similarity=RawSQL(
+            f'word_similarity(%s, {table}.name)',
+            (query,),
+            output_field=FloatField()
+        )).order_by('-similarity', Lower('name'), 'id')[:limit])
@@ -0,0 +1,74 @@
+import functools
+import json
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.utils.encoders import JSONEncoder
+from core.cache import LRUCache
+
+
+def _payload_size(data):
+    """ Approximate the memory held by a payload with its JSON length"""
+    return len(json.dumps(data, cls=JSONEncoder))
+
+
+class LocalDetailCache:
+    """ Recipe detail payloads kept in a per-process LRU bounded in bytes"""
+
+    def __init__(self, max_bytes):
+        self.lru = LRUCache(
+            maxsize=float('inf'),
+            maxbytes=max_bytes,
+            sizeof=_payload_size
+        )
+
+    def get(self, key):
+        return self.lru.get(key)
+
+    def set(self, key, data):
+        self.lru.set(key, data)
+
+    def clear(self):
+        self.lru.clear()
+
+
+class DjangoDetailCache:
+    """ Recipe detail payloads kept in a Django cache"""
+
+    def __init__(self, alias, timeout):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+@functools.lru_cache(maxsize=None)
+def _local_cache(max_bytes):
+    return LocalDetailCache(max_bytes)
+
+
+def get_detail_cache():
+    """ Return the detail cache configured by RECIPE_DETAIL_CACHE"""
+    options = getattr(settings, 'RECIPE_DETAIL_CACHE', {})
+    if options.get('BACKEND', 'local') == 'django':
+        return DjangoDetailCache(
+            options.get('CACHE_ALIAS', 'default'),
+            options.get('TIMEOUT', 300)
+        )
+
+    return _local_cache(options.get('MAX_BYTES', 16 * 1024 * 1024))
+
+
+def detail_cache_key(user_id, recipe_id, version):
+    """ Key a payload by owner, recipe and collection version
+
+    Any change to the user's recipes, tags or ingredients bumps the
+    version, so stale payloads are never read again and age out.
+    """
+    return f'recipe-detail:{user_id}:{recipe_id}:{version}'
@@ -0,0 +1,70 @@
+import csv
+import io
+import itertools
+import json
+from core.conf import setting_reader
+from core.renderers import FastJSONRenderer
+from .fastpath import FastRecipeSerializer, recipe_columns
+from .serializers import RecipeSerializer
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+_export_setting = setting_reader('RECIPE_EXPORT')
+
+
+def export_chunks(queryset, chunk_size=None):
+    """ Yield lists of recipe payloads, shaped like the recipe detail
+
+    Rows are read from a server-side cursor and the tags and ingredients
+    of every chunk are looked up together, so memory is bounded by
+    RECIPE_EXPORT['CHUNK_SIZE'] rather than by the collection.
+    """
+    chunk_size = chunk_size or _export_setting('CHUNK_SIZE', 2000)
+    rows = queryset.values(*recipe_columns()).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield FastRecipeSerializer(
+            chunk,
+            many=True,
+            expand=('tags', 'ingredient')
+        ).data
+
+
+def ndjson_stream(queryset, chunk_size=None):
+    """ Yield the recipes as newline delimited JSON, a chunk at a time"""
+    renderer = FastJSONRenderer()
+    for chunk in export_chunks(queryset, chunk_size):
+        yield b''.join(renderer.render(item) + b'\n' for item in chunk)
+
+
+def csv_stream(queryset, chunk_size=None):
+    """ Yield the recipes as CSV, a chunk at a time
+
+    The tags and ingredient columns hold JSON arrays of names, which
+    keeps names containing separators intact.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RecipeSerializer.Meta.fields)
+    for chunk in export_chunks(queryset, chunk_size):
+        for item in chunk:
+            writer.writerow([
+                json.dumps(
+                    [related['name'] for related in value],
+                    ensure_ascii=False
+                )
+                if isinstance(value, list) else value
+                for value in item.values()
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # An empty collection still gets its header
+        yield buffer.getvalue().encode()
@@ -0,0 +1,150 @@
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image
+from core.conf import setting_reader
+from core.models import CollectionVersion, Recipe
+
+logger = logging.getLogger(__name__)
+
+# Name, bounding box, Pillow format and extension of every rendition,
+# largest first so each one can be downscaled from the previous.
+RENDITIONS = (
+    ('medium', (800, 800), 'JPEG', 'jpg'),
+    ('webp', (800, 800), 'WEBP', 'webp'),
+    ('thumbnail', (200, 200), 'JPEG', 'jpg'),
+)
+
+
+def rendition_name(image_name, key):
+    """ Return the storage name of a rendition of an image"""
+    ext = {name: ext for name, _, _, ext in RENDITIONS}[key]
+    return f'{os.path.splitext(image_name)[0]}_{key}.{ext}'
+
+
+def render_renditions(source_path, targets):
+    """ Decode an image once and write each (path, size, format) target
+
+    Runs in a worker process, so it must only touch the filesystem.
+    """
+    with Image.open(source_path) as image:
+        # Let JPEG decode at a reduced scale when it is much larger
+        largest = max(size for _, size, _ in targets)
+        image.draft('RGB', largest)
+        image = image.convert('RGB')
+
+    for path, size, image_format in targets:
+        if image.width > size[0] or image.height > size[1]:
+            image.thumbnail(size, Image.LANCZOS)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        image.save(path, image_format, quality=85)
+    return [path for path, _, _ in targets]
+
+
+_pipeline_setting = setting_reader('RECIPE_IMAGE_PIPELINE')
+
+
+@functools.lru_cache(maxsize=None)
+def _executor(kind, workers):
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    elif kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers)
+
+    return None
+
+
+def _targets(image_name):
+    return [
+        (default_storage.path(rendition_name(image_name, key)), size, fmt)
+        for key, size, fmt, _ in RENDITIONS
+    ]
+
+
+def _finish(recipe_id, user_id, image_name, submitter, future):
+    """ Record the outcome of a pipeline run, unless the image changed"""
+    try:
+        future.result()
+        status = Recipe.IMAGE_READY
+    except Exception:
+        logger.exception('Processing image %s failed', image_name)
+        status = Recipe.IMAGE_FAILED
+
+    try:
+        Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_status=status
+        )
+        CollectionVersion.bump(user_id)
+    finally:
+        # Callbacks usually run on executor threads, which own their
+        # connections, but run in the submitting thread if already done
+        if threading.get_ident() != submitter:
+            connections.close_all()
+    return status
+
+
+class _DoneFuture:
+    """ Minimal future for a pipeline run done in the calling thread"""
+
+    def __init__(self, func, *args):
+        self._error = None
+        try:
+            func(*args)
+        except Exception as error:
+            self._error = error
+
+    def result(self):
+        if self._error is not None:
+            raise self._error
+
+
+def process_recipe_image(recipe):
+    """ Render the renditions of a recipe's image in the background
+
+    RECIPE_IMAGE_PIPELINE picks a 'process' or 'thread' pool, or 'sync'
+    to render in the calling thread. The recipe's image_status turns to
+    ready or failed once the renditions are written, or failed at once
+    when the pool cannot take the job.
+    """
+    image_name = recipe.image.name
+    args = (recipe.image.path, _targets(image_name))
+    executor = _executor(
+        _pipeline_setting('EXECUTOR', 'process'),
+        _pipeline_setting('WORKERS', None)
+    )
+    if executor is None:
+        recipe.image_status = _finish(
+            recipe.pk,
+            recipe.user_id,
+            image_name,
+            threading.get_ident(),
+            _DoneFuture(render_renditions, *args)
+        )
+        return
+
+    try:
+        future = executor.submit(render_renditions, *args)
+    except Exception:
+        # A worker that died, say OOM-killed on a huge image, breaks a
+        # process pool for good: drop it so the next upload gets a new one
+        logger.exception('Submitting image %s failed', image_name)
+        _executor.cache_clear()
+        executor.shutdown(wait=False)
+        Recipe.objects.filter(pk=recipe.pk, image=image_name).update(
+            image_status=Recipe.IMAGE_FAILED
+        )
+        CollectionVersion.bump(recipe.user_id)
+        recipe.image_status = Recipe.IMAGE_FAILED
+        return
+
+    future.add_done_callback(functools.partial(
+        _finish,
+        recipe.pk,
+        recipe.user_id,
+        image_name,
+        threading.get_ident()
+    ))
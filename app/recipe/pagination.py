@@ -0,0 +1,49 @@
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+
+class BaseCursorPagination(CursorPagination):
+    """ Keyset pagination of every list, 50 items a page by default
+
+    Clients pick up to ``max_page_size`` items with ``page_size``. Every
+    page is fetched with a ``WHERE`` on the ordering key instead of an
+    ``OFFSET``, so its cost does not grow with the depth of the cursor.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class RecipeCursorPagination(BaseCursorPagination):
+    """ Paginate recipes, newest first"""
+    ordering = '-id'
+
+
+class RecipeAttrCursorPagination(BaseCursorPagination):
+    """ Paginate tags and ingredients by name"""
+    ordering = ('-name', 'id')
+
+
+class RankedPagination(BasePagination):
+    """ Send ranked results as the only page of the usual envelope
+
+    Searches and autocompletion are ordered by relevance, which a cursor
+    cannot resume from, and are capped instead. Their hits come back in
+    ``results`` with no next or previous page, like a last cursor page.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return list(queryset)
+
+    def get_paginated_response(self, data):
+        return Response({'next': None, 'previous': None, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
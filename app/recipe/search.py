@@ -0,0 +1,132 @@
+import re
+from collections import defaultdict
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+from core.cache import LRUCache
+from core.conf import setting_reader
+from core.models import CollectionVersion, Recipe, search_config
+
+# Weights of title, tag and ingredient matches, as ts_rank gives A, B, C
+TITLE_WEIGHT = 1.0
+TAG_WEIGHT = 0.4
+INGREDIENT_WEIGHT = 0.2
+
+TOKEN = re.compile(r'\w+')
+
+
+_search_setting = setting_reader('RECIPE_SEARCH')
+
+
+def tokenize(text):
+    """ Split text into lowercase words"""
+    return TOKEN.findall(text.lower())
+
+
+class RecipeSearchIndex:
+    """ Inverted index of a user's recipes, the non-PostgreSQL fallback
+
+    Maps every word of the titles, tag names and ingredient names to the
+    weight it carries in each recipe. Built with three queries and kept
+    until the user's CollectionVersion changes.
+    """
+
+    def __init__(self, user_id):
+        self.postings = defaultdict(lambda: defaultdict(float))
+        recipes = Recipe.objects.filter(user_id=user_id)
+        self._add(recipes.values_list('id', 'title'), TITLE_WEIGHT)
+        self._add(
+            Recipe.tags.through.objects.filter(
+                recipe__user_id=user_id
+            ).values_list('recipe_id', 'tag__name'),
+            TAG_WEIGHT
+        )
+        self._add(
+            Recipe.ingredient.through.objects.filter(
+                recipe__user_id=user_id
+            ).values_list('recipe_id', 'ingredient__name'),
+            INGREDIENT_WEIGHT
+        )
+
+    def _add(self, rows, weight):
+        for recipe_id, text in rows:
+            for word in tokenize(text):
+                self.postings[word][recipe_id] += weight
+
+    def search(self, query):
+        """ Return the rank of every recipe matching all words of query
+
+        The posting lists are intersected shortest first, only the recipes
+        in every one of them are scored.
+        """
+        postings = [self.postings.get(word, {}) for word in tokenize(query)]
+        if not postings:
+            return {}
+
+        postings.sort(key=len)
+        matching = set(postings[0])
+        for posting in postings[1:]:
+            if not matching:
+                break
+            matching.intersection_update(posting)
+        return {
+            recipe_id: sum(posting[recipe_id] for posting in postings)
+            for recipe_id in matching
+        }
+
+
+_indexes = LRUCache(_search_setting('INDEX_CACHE_SIZE', 256))
+
+
+def get_search_index(user_id):
+    """ Return the search index of the user's current collection"""
+    version = CollectionVersion.current(user_id)
+    cached = _indexes.get(user_id)
+    if cached is None or cached[0] != version:
+        cached = (version, RecipeSearchIndex(user_id))
+        _indexes.set(user_id, cached)
+    return cached[1]
+
+
+def clear_search_indexes():
+    _indexes.clear()
+
+
+def search_recipes(queryset, user_id, query):
+    """ Narrow a recipe queryset to the best matches of a search query
+
+    The result is annotated with ``search_rank``, ordered by it and
+    capped at RECIPE_SEARCH['MAX_RESULTS'] so its cost follows the
+    number of matches rather than the size of the collection.
+    """
+    limit = _search_setting('MAX_RESULTS', 100)
+    if Recipe.objects.db_manager(queryset.db).has_search_vector():
+        table = Recipe._meta.db_table
+        tsquery = 'plainto_tsquery(%s::regconfig, %s)'
+        params = (search_config(), query)
+        return queryset.filter(RawSQL(
+            f'{table}.search_vector @@ {tsquery}',
+            params,
+            output_field=BooleanField()
+        )).annotate(search_rank=RawSQL(
+            f'ts_rank({table}.search_vector, {tsquery})',
+            params,
+            output_field=FloatField()
+        )).order_by('-search_rank', '-id')[:limit]
+
+    ranks = get_search_index(user_id).search(query)
+    # Only matches are checked against the queryset's filters, best first
+    ranked = sorted(ranks, key=lambda pk: (ranks[pk], pk), reverse=True)
+    top = []
+    for start in range(0, len(ranked), limit):
+        chunk = ranked[start:start + limit]
+        allowed = set(queryset.order_by().filter(pk__in=chunk).values_list(
+            'id', flat=True
+        ))
+        top += [pk for pk in chunk if pk in allowed]
+        if len(top) >= limit:
+            break
+    top = top[:limit]
+    return queryset.filter(pk__in=top).annotate(search_rank=Case(
+        *[When(pk=pk, then=Value(ranks[pk])) for pk in top],
+        output_field=FloatField()
+    )).order_by('-search_rank', '-id')
@@ -1,8 +1,56 @@
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
 from core.models import Tag, Ingredient, Recipe
+from .imaging import RENDITIONS, rendition_name
 
 
-class TagSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    """ Reject names the user already has, whatever their case"""
+
+    def validate_name(self, value):
+        duplicates = self.Meta.model.objects.annotate(
+            lower_name=Lower('name')
+        ).filter(
+            user=self.context['request'].user,
+            lower_name=Lower(Value(value))
+        )
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError(
+                _('You already have this name.'),
+                code='unique'
+            )
+        return value
+
+    def save(self, **kwargs):
+        # A concurrent request can insert the name after validate_name,
+        # the unique index then settles it
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'name': [_('You already have this name.')]},
+                code='unique'
+            )
+
+
+class NameListSerializer(serializers.Serializer):
+    """ Serializer for names to resolve to tags or ingredients"""
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=256),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """ Serializer for tags object"""
 
     class Meta:
@@ -11,7 +59,15 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """ Serializer for tags annotated with their number of recipes"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ('recipe_count',)
+
+
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """ Serializer for Ingredient model"""
 
     class Meta:
@@ -20,14 +76,191 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class IngredientCountSerializer(IngredientSerializer):
+    """ Serializer for ingredients annotated with their number of recipes"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ('recipe_count',)
+
+
+class BatchedManyRelatedField(serializers.ManyRelatedField):
+    """ Many related field resolving all its ids with a single query
+
+    A list serializer validating many objects at once may store
+    ``{field_name: {pk: obj}}`` under ``related_objects`` in the context,
+    so every item is validated without querying the database. Unknown ids
+    are reported together in a single error.
+    """
+    default_error_messages = {
+        'does_not_exist': _('Invalid pks {pk_values} - objects do not exist.'),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = []
+        for pk in data:
+            if isinstance(pk, bool) or _to_int(pk) is None:
+                self.child_relation.fail(
+                    'incorrect_type',
+                    data_type=type(pk).__name__
+                )
+            pks.append(_to_int(pk))
+
+        resolved = self.context.get('related_objects', {}).get(self.field_name)
+        if resolved is None:
+            resolved = self.child_relation.get_queryset().in_bulk(set(pks))
+
+        missing = [pk for pk in pks if pk not in resolved]
+        if missing:
+            self.fail('does_not_exist', pk_values=missing)
+        return [resolved[pk] for pk in pks]
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """ Primary key related field limited to the requesting user's objects,
+    using BatchedManyRelatedField for many"""
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            queryset = queryset.filter(user=request.user)
+        return queryset
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """ Validate and create or update many recipes with batched queries
+
+    Updates are given the recipes to change as instance, every item
+    names the one it updates by id.
+    """
+    max_items = 1000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and len(data) > self.max_items:
+            raise serializers.ValidationError({
+                'non_field_errors': [
+                    f'Ensure there are at most {self.max_items} items.'
+                ]
+            })
+        if isinstance(data, list):
+            self.context['related_objects'] = self._resolve_related(data)
+        if self.instance is not None:
+            self._recipes = {recipe.pk: recipe for recipe in self.instance}
+            self._seen = set()
+
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+
+        pk = _to_int(data.get('id')) if isinstance(data, dict) else None
+        if pk not in self._recipes:
+            raise serializers.ValidationError({'id': ['Unknown recipe.']})
+        if pk in self._seen:
+            raise serializers.ValidationError({'id': ['Duplicate recipe.']})
+        self._seen.add(pk)
+
+        self.child.instance = self._recipes[pk]
+        validated = super().run_child_validation(data)
+        validated['id'] = pk
+        return validated
+
+    def _resolve_related(self, data):
+        """ Load every referenced object with one IN query per relation"""
+        resolved = {}
+        for name, field in self.child.fields.items():
+            if not isinstance(field, BatchedManyRelatedField):
+                continue
+
+            ids = set()
+            for item in data:
+                values = item.get(name) if isinstance(item, dict) else None
+                if isinstance(values, list):
+                    ids.update(_to_int(pk) for pk in values)
+            ids.discard(None)
+            resolved[name] = field.child_relation.get_queryset().in_bulk(ids)
+        return resolved
+
+    def create(self, validated_data):
+        recipes, tags, ingredients = [], [], []
+        for attrs in validated_data:
+            tags.append([tag.id for tag in attrs.pop('tags', [])])
+            ingredients.append(
+                [ingredient.id for ingredient in attrs.pop('ingredient', [])]
+            )
+            recipes.append(Recipe(**attrs))
+
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create_with_relations(
+                recipes, tags, ingredients
+            )
+
+        models.prefetch_related_objects(recipes, 'tags', 'ingredient')
+        return recipes
+
+    def update(self, instance, validated_data):
+        recipes, fields, tags, ingredients = [], set(), [], []
+        for attrs in validated_data:
+            recipe = self._recipes[attrs.pop('id')]
+            tags.append([tag.id for tag in attrs.pop('tags')]
+                        if 'tags' in attrs else None)
+            ingredients.append(
+                [ingredient.id for ingredient in attrs.pop('ingredient')]
+                if 'ingredient' in attrs else None
+            )
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            fields.update(attrs)
+            recipes.append(recipe)
+
+        with transaction.atomic():
+            Recipe.objects.bulk_update_with_relations(
+                recipes, fields, tags, ingredients
+            )
+
+        for recipe in recipes:
+            recipe.__dict__.pop('_prefetched_objects_cache', None)
+        models.prefetch_related_objects(recipes, 'tags', 'ingredient')
+        return recipes
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Nested serializers of the relations a recipe listing can expand
+EXPANDABLE = {
+    'tags': TagSerializer,
+    'ingredient': IngredientSerializer,
+}
+
+
 class RecipeSerializer(serializers.ModelSerializer):
 
-    ingredient = serializers.PrimaryKeyRelatedField(
+    ingredient = BatchedPrimaryKeyRelatedField(
         many=True,
         queryset=Ingredient.objects.all()
     )
 
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BatchedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all()
     )
@@ -39,6 +272,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             'price', 'tags', 'ingredient', 'link'
             )
         read_only_fields = ('id', )
+        list_serializer_class = RecipeListSerializer
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        """ Keep only ``fields``, if given, and nest the ``expand``ed
+        relations like RecipeDetailSerializer"""
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = EXPANDABLE[name](many=True, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -49,8 +293,22 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     """ Serializer for uploading images to recipe """
+    renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image')
-        read_only_fields = ('id', )
+        fields = ('id', 'image', 'image_status', 'renditions')
+        read_only_fields = ('id', 'image_status')
+
+    def get_renditions(self, obj):
+        """ Return the URL of each rendition once they are written"""
+        if obj.image_status != Recipe.IMAGE_READY:
+            return {}
+
+        request = self.context.get('request')
+        urls = {}
+        for rendition in RENDITIONS:
+            key = rendition[0]
+            url = default_storage.url(rendition_name(obj.image.name, key))
+            urls[key] = request.build_absolute_uri(url) if request else url
+        return urls
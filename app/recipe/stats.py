@@ -0,0 +1,146 @@
+from decimal import Decimal
+from django.db.models import CharField, Count, Q, Sum, Value
+from core.models import Ingredient, Recipe, RecipeStat, Tag, price_buckets
+
+
+def _price_filters(bounds):
+    """ Return one filter per price bucket, split at the bounds"""
+    lower = (None,) + bounds
+    upper = bounds + (None,)
+    filters = []
+    for low, high in zip(lower, upper):
+        q = Q()
+        if low is not None:
+            q &= Q(price__gte=low)
+        if high is not None:
+            q &= Q(price__lt=high)
+        filters.append(q)
+    return filters
+
+
+def _payload(count, time_minute_total, price_total, histogram, names):
+    """ Shape the totals into the stats response
+
+    ``names`` holds (kind, id, name, recipe count) rows of the tags and
+    ingredients, which are listed most used first.
+    """
+    bounds = price_buckets()
+    listed = {RecipeStat.TAG: [], RecipeStat.INGREDIENT: []}
+    for kind, pk, name, recipe_count in names:
+        if recipe_count > 0:
+            listed[kind].append(
+                {'id': pk, 'name': name, 'recipe_count': recipe_count}
+            )
+    for items in listed.values():
+        items.sort(key=lambda item: (-item['recipe_count'], item['name']))
+
+    return {
+        'recipe_count': count,
+        'time_minute_avg': round(time_minute_total / count, 2)
+        if count else None,
+        'price_avg': round(float(price_total) / count, 2) if count else None,
+        'price_histogram': [
+            {'min': low, 'max': high, 'count': bucket}
+            for low, high, bucket in zip(
+                (None,) + bounds, bounds + (None,), histogram
+            )
+        ],
+        'tags': listed[RecipeStat.TAG],
+        'ingredients': listed[RecipeStat.INGREDIENT],
+    }
+
+
+def _aggregate(queryset):
+    """ Return the totals, histogram and name counts of recipes, running
+    one aggregate and one UNION of the grouped link counts"""
+    filters = _price_filters(price_buckets())
+    totals = queryset.order_by().aggregate(
+        recipe_count=Count('id'),
+        time_minute_total=Sum('time_minute'),
+        price_total=Sum('price'),
+        **{
+            f'price_{i}': Count('id', filter=bucket)
+            for i, bucket in enumerate(filters)
+        }
+    )
+    recipes = queryset.order_by().values('pk')
+
+    counts = []
+    for kind, relation in (
+        (RecipeStat.TAG, 'tags'),
+        (RecipeStat.INGREDIENT, 'ingredient'),
+    ):
+        through = getattr(Recipe, relation).through
+        counts.append(through.objects.filter(
+            recipe__in=recipes
+        ).values(f'{kind}_id', f'{kind}__name').annotate(
+            kind=Value(kind, output_field=CharField()),
+            recipe_count=Count('recipe_id')
+        ).values_list('kind', f'{kind}_id', f'{kind}__name', 'recipe_count'))
+
+    return (
+        totals['recipe_count'],
+        totals['time_minute_total'] or 0,
+        totals['price_total'] or Decimal(0),
+        [totals[f'price_{i}'] for i in range(len(filters))],
+        list(counts[0].union(counts[1], all=True)),
+    )
+
+
+def recipe_stats(queryset):
+    """ Compute the stats of a recipe queryset in two queries"""
+    return _payload(*_aggregate(queryset))
+
+
+def summary_stats(user_id):
+    """ Return the stats of all the user's recipes from RecipeStat
+
+    Reads the summary and the names it counts in two queries, building
+    the summary from the recipes on first use.
+    """
+    rows = list(RecipeStat.objects.filter(user_id=user_id).values_list(
+        'kind', 'key', 'count', 'time_minute_total', 'price_total'
+    ))
+    if not rows:
+        stats = _aggregate(Recipe.objects.filter(user_id=user_id))
+        count, time_minute_total, price_total, histogram, names = stats
+        RecipeStat.store(
+            user_id,
+            [(RecipeStat.RECIPES, 0, count, time_minute_total, price_total)]
+            + [
+                (RecipeStat.PRICE, i, bucket, 0, 0)
+                for i, bucket in enumerate(histogram)
+            ]
+            + [(kind, pk, n, 0, 0) for kind, pk, _, n in names]
+        )
+        return _payload(*stats)
+
+    count, time_minute_total, price_total = 0, 0, Decimal(0)
+    histogram = [0] * (len(price_buckets()) + 1)
+    counted = {RecipeStat.TAG: {}, RecipeStat.INGREDIENT: {}}
+    for kind, key, n, time_minute, price in rows:
+        if kind == RecipeStat.RECIPES:
+            count, time_minute_total, price_total = n, time_minute, price
+        elif kind == RecipeStat.PRICE and key < len(histogram):
+            histogram[key] = n
+        elif kind in counted and n > 0:
+            counted[kind][key] = n
+
+    names = Tag.objects.filter(user_id=user_id).annotate(
+        kind=Value(RecipeStat.TAG, output_field=CharField())
+    ).values_list('kind', 'id', 'name').union(
+        Ingredient.objects.filter(user_id=user_id).annotate(
+            kind=Value(RecipeStat.INGREDIENT, output_field=CharField())
+        ).values_list('kind', 'id', 'name'),
+        all=True
+    )
+    return _payload(
+        count,
+        time_minute_total,
+        price_total,
+        histogram,
+        [
+            (kind, pk, name, counted[kind][pk])
+            for kind, pk, name in names if pk in counted[kind]
+        ]
+    )
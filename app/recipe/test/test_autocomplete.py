@@ -0,0 +1,178 @@
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+from ..autocomplete import NameIndex, autocomplete, clear_name_indexes, \
+                           get_name_index, trigrams
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class NameIndexTest(TestCase):
+    """ Test the in-memory autocomplete index"""
+
+    def setUp(self):
+        self.index = NameIndex([
+            (1, 'Tomato'),
+            (2, 'tomato paste'),
+            (3, 'Potato'),
+            (4, 'Tofu'),
+            (5, 'Thyme'),
+        ])
+
+    def test_trigrams(self):
+        """ Test words are padded and split like pg_trgm does"""
+        self.assertEqual(
+            trigrams('Ab-c'),
+            {'  a', ' ab', 'ab ', '  c', ' c '}
+        )
+
+    def test_prefix(self):
+        """ Test prefixes match case-insensitively in name order"""
+        self.assertEqual(self.index.prefix('to', 10), [4, 1, 2])
+        self.assertEqual(self.index.prefix('TOMATO', 1), [1])
+        self.assertEqual(self.index.prefix('x', 10), [])
+
+    def test_similar(self):
+        """ Test fuzzy matches rank by shared trigrams"""
+        self.assertEqual(self.index.similar('tomatoe', 10, 0.6), [1, 2])
+        self.assertEqual(self.index.similar('tomatoe', 1, 0.6), [1])
+        self.assertEqual(self.index.similar('zzz', 10, 0.6), [])
+
+
+class AutocompleteApiTest(TestCase):
+    """ Test autocompleting tags and ingredients"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'complete@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        clear_name_indexes()
+        for name in ('Vegan', 'Vegetarian', 'Dessert', 'Breakfast'):
+            Tag.objects.create(user=self.user, name=name)
+        for name in ('Tomato', 'Potato', 'Basil'):
+            Ingredient.objects.create(user=self.user, name=name)
+
+    def _names(self, url, params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data['results']]
+
+    def test_prefix(self):
+        """ Test completing a prefix, limited and on a single page"""
+        self.assertEqual(
+            self._names(TAGS_URL, {'prefix': 've'}),
+            ['Vegan', 'Vegetarian']
+        )
+        self.assertEqual(
+            self._names(TAGS_URL, {'prefix': 've', 'limit': 1}),
+            ['Vegan']
+        )
+        self.assertEqual(
+            self._names(TAGS_URL, {'prefix': 've', 'page_size': 1}),
+            ['Vegan', 'Vegetarian']
+        )
+
+    def test_fuzzy_query(self):
+        """ Test q tolerates typos"""
+        self.assertEqual(
+            self._names(INGREDIENTS_URL, {'q': 'tomatoe'}),
+            ['Tomato']
+        )
+
+    def test_limited_to_user(self):
+        """ Test names of other users are never completed"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        Tag.objects.create(user=other, name='Vegetable')
+
+        self.assertNotIn('Vegetable', self._names(TAGS_URL, {'prefix': 've'}))
+
+    def test_index_follows_changes(self):
+        """ Test the index is reused until a name is added"""
+        self._names(TAGS_URL, {'prefix': 'b'})
+        with CaptureQueriesContext(connection) as ctx:
+            self._names(TAGS_URL, {'prefix': 'b'})
+        self.assertFalse(any('core_tag' in q['sql'] for q in ctx))
+
+        Tag.objects.create(user=self.user, name='Brunch')
+
+        self.assertEqual(
+            self._names(TAGS_URL, {'prefix': 'b'}),
+            ['Breakfast', 'Brunch']
+        )
+
+    def test_prefix_assigned_only(self):
+        """ Test completion applies on top of assigned_only"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minute=5,
+            price=3.00
+        )
+        recipe.tags.add(Tag.objects.get(name='Vegetarian'))
+
+        names = self._names(TAGS_URL, {'prefix': 've', 'assigned_only': 1})
+
+        self.assertEqual(names, ['Vegetarian'])
+
+    def test_invalid_limit(self):
+        """ Test a non numeric limit is rejected"""
+        res = self.client.get(TAGS_URL, {'prefix': 've', 'limit': 'all'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AutocompleteConsistencyTest(TestCase):
+    """ Test the index and the database answer alike"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'consistent@gmail.com',
+            'Signup!23'
+        )
+        clear_name_indexes()
+        for name in ('Tomato', 'tomato paste', 'Potato', 'Tofu', 'Thyme'):
+            Ingredient.objects.create(user=self.user, name=name)
+        self.queryset = Ingredient.objects.filter(user=self.user)
+        self.index = get_name_index(Ingredient, self.user.pk, force=True)
+
+    def _database(self, **params):
+        return [
+            obj.name for obj in
+            autocomplete(self.queryset, self.user.pk, use_index=False,
+                         **params)
+        ]
+
+    def _index(self, ids):
+        return [self.index.names[pk] for pk in ids]
+
+    def test_prefix(self):
+        """ Test both complete a prefix with the same names"""
+        for prefix in ('t', 'TO', 'tomato ', 'x'):
+            self.assertEqual(
+                self._database(prefix=prefix),
+                self._index(self.index.prefix(prefix, 10))
+            )
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs pg_trgm')
+    @override_settings(RECIPE_AUTOCOMPLETE={'THRESHOLD': 0.3})
+    def test_fuzzy_threshold(self):
+        """ Test pg_trgm honours a threshold below its 0.6 default"""
+        for query in ('tomatoe', 'potaot', 'thym'):
+            # Ties may rank differently, the names have to agree
+            self.assertCountEqual(
+                self._database(query=query),
+                self._index(self.index.similar(query, 10, 0.3))
+            )
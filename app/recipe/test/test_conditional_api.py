@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+def detail_url(recipe_id):
+
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalListTest(TestCase):
+    """ Test ETag and If-None-Match support on the list endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'etag@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minute=5,
+            price=3.00
+        )
+
+    def _etag(self, url):
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res['ETag']
+
+    def test_not_modified(self):
+        """ Test a matching If-None-Match skips the list query"""
+        etag = self._etag(RECIPE_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('core_recipe', ctx.captured_queries[0]['sql'])
+
+    def test_etag_depends_on_query(self):
+        """ Test filtered lists do not share an ETag"""
+        etag = self._etag(RECIPE_URL)
+
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': self.tag.id},
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_per_user(self):
+        """ Test another user never matches the ETag"""
+        etag = self._etag(TAGS_URL)
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_m2m_change_through_serializer(self):
+        """ Test updating recipe tags through the API invalidates"""
+        etag = self._etag(RECIPE_URL)
+
+        self.client.patch(detail_url(self.recipe.id), {'tags': [self.tag.id]})
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['tags'], [self.tag.id])
+
+    def test_m2m_add_and_remove(self):
+        """ Test direct M2M changes invalidate the tag list"""
+        url = f'{TAGS_URL}?assigned_only=1'
+        etag = self._etag(url)
+
+        self.recipe.tags.add(self.tag)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = res['ETag']
+        self.recipe.tags.remove(self.tag)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+
+    def test_ingredient_create_and_delete(self):
+        """ Test creating and deleting ingredients invalidates"""
+        etag = self._etag(INGREDIENT_URL)
+
+        self.client.post(INGREDIENT_URL, {'name': 'Kale'})
+        res = self.client.get(INGREDIENT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = res['ETag']
+        Ingredient.objects.filter(user=self.user).delete()
+        res = self.client.get(INGREDIENT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Recipe
+from ..cache import get_detail_cache
+
+
+def detail_url(recipe_id):
+
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeDetailCacheTest(TestCase):
+    """ Test caching of the recipe detail payloads"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'detail@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Salad',
+            time_minute=5,
+            price=3.00
+        )
+        self.recipe.tags.add(self.tag)
+        get_detail_cache().clear()
+
+    def _get(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res, len(ctx.captured_queries)
+
+    def test_cached_retrieve(self):
+        """ Test a cached payload only costs the version lookup"""
+        first, _ = self._get()
+        second, queries = self._get()
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(queries, 1)
+
+    def test_update_invalidates(self):
+        """ Test updating the recipe serves the new payload"""
+        self._get()
+
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Soup'})
+        res, _ = self._get()
+
+        self.assertEqual(res.data['title'], 'Soup')
+
+    def test_tag_rename_invalidates(self):
+        """ Test renaming a referenced tag serves the new name"""
+        self._get()
+
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+        res, _ = self._get()
+
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_other_user_not_served(self):
+        """ Test another user cannot read a cached payload"""
+        self._get()
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(RECIPE_DETAIL_CACHE={'BACKEND': 'django'})
+    def test_django_cache_backend(self):
+        """ Test payloads can be kept in the Django cache framework"""
+        get_detail_cache().clear()
+        first, _ = self._get()
+        second, queries = self._get()
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(queries, 1)
@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.benchmark import seed_user
+from core.models import Tag, Ingredient, Recipe
+from ..export import ndjson_stream
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def read(response):
+    return b''.join(response.streaming_content).decode()
+
+
+@override_settings(RECIPE_EXPORT={'CHUNK_SIZE': 2})
+class RecipeExportTest(TestCase):
+    """ Test streaming exports of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'export@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        salt = Ingredient.objects.create(user=self.user, name='Salt, fine')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i}',
+                time_minute=i,
+                price='5.50'
+            )
+            if i % 2:
+                recipe.tags.add(self.vegan)
+                recipe.ingredient.add(salt)
+
+        other = get_user_model().objects.create_user('other@gmail.com')
+        Recipe.objects.create(
+            user=other,
+            title='Other',
+            time_minute=1,
+            price=1
+        )
+
+    def test_export_ndjson(self):
+        """ Test recipes are streamed as one JSON object per line"""
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('recipes.ndjson', res['Content-Disposition'])
+        items = [json.loads(line) for line in read(res).splitlines()]
+        self.assertEqual(
+            [item['title'] for item in items],
+            [f'Recipe {i}' for i in range(4, -1, -1)]
+        )
+        self.assertEqual(
+            items[1]['tags'],
+            [{'id': self.vegan.id, 'name': 'Vegan'}]
+        )
+        self.assertEqual(items[1]['price'], '5.50')
+        self.assertEqual(items[0]['ingredient'], [])
+
+    def test_export_csv(self):
+        """ Test recipes are streamed as CSV with names of related objects"""
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(read(res))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1]['title'], 'Recipe 3')
+        self.assertEqual(json.loads(rows[1]['tags']), ['Vegan'])
+        self.assertEqual(json.loads(rows[1]['ingredient']), ['Salt, fine'])
+
+    def test_export_filtered(self):
+        """ Test exports honour the list filters"""
+        res = self.client.get(EXPORT_URL, {'tags': self.vegan.id})
+
+        self.assertEqual(len(read(res).splitlines()), 2)
+
+    def test_export_empty_csv(self):
+        """ Test an empty collection exports the CSV header"""
+        Recipe.objects.filter(user=self.user).delete()
+
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(
+            read(res).strip(),
+            'id,title,time_minute,price,tags,ingredient,link'
+        )
+
+    def test_export_invalid_output(self):
+        """ Test unknown outputs are rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeExportMemoryTest(TestCase):
+    """ Test exports stream in constant memory"""
+
+    def test_export_large_collection(self):
+        """ Test 100k recipes are exported under a fixed memory ceiling"""
+        user = seed_user(
+            'export-memory@gmail.com',
+            100000,
+            tags_per_recipe=1,
+            ingredients_per_recipe=1
+        )
+        queryset = Recipe.objects.filter(user=user).order_by('-id')
+
+        lines = size = 0
+        tracemalloc.start()
+        try:
+            for data in ndjson_stream(queryset, chunk_size=1000):
+                lines += data.count(b'\n')
+                size += len(data)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(lines, 100000)
+        # A few chunks at most, far below the 16 MB of the export
+        self.assertLess(peak, 5 * 1024 * 1024)
+        self.assertGreater(size, 3 * peak)
+
+    @override_settings(RECIPE_EXPORT={'CHUNK_SIZE': 500})
+    def test_export_endpoint_streams(self):
+        """ Test the endpoint streams its body in chunks as it is read"""
+        user = seed_user(
+            'export-stream@gmail.com',
+            2000,
+            tags_per_recipe=1,
+            ingredients_per_recipe=1
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(EXPORT_URL, HTTP_ACCEPT_ENCODING='identity')
+
+        self.assertTrue(res.streaming)
+        chunks = [chunk.count(b'\n') for chunk in res.streaming_content]
+        self.assertEqual(chunks, [500] * 4)
@@ -0,0 +1,115 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+from ..cache import get_detail_cache
+from ..fastpath import FastRecipeSerializer, recipe_columns
+from ..serializers import RecipeDetailSerializer, RecipeSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAG_URL = reverse('recipe:tag-list')
+INGREDIENT_URL = reverse('recipe:ingredient-list')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastRecipeSerializerTest(TestCase):
+    """ Test the fast serializers render like the DRF serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'fast@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_detail_cache().clear()
+
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Quick', 'Dinner')
+        ]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        for title, price, linked in (
+            ('Salad', Decimal('4.5'), tags[::-1]),
+            ('Soup', Decimal('12.00'), tags[1:]),
+            ('Steak', Decimal('0.99'), []),
+        ):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=title,
+                time_minute=10,
+                price=price,
+                link=f'https://example.com/{title}'
+            )
+            recipe.tags.add(*linked)
+            if linked:
+                recipe.ingredient.add(salt)
+
+    def _recipes(self):
+        return Recipe.objects.filter(user=self.user).order_by('-id')
+
+    def test_list_equivalent(self):
+        """ Test listed recipes render the same bytes"""
+        for fields, expand in (
+            (None, ()),
+            (('id', 'price'), ()),
+            (None, ('tags',)),
+            (('title', 'tags', 'ingredient'), ('tags', 'ingredient')),
+        ):
+            recipes = self._recipes().prefetch_related('tags', 'ingredient')
+            expected = RecipeSerializer(
+                recipes, many=True, fields=fields, expand=expand
+            ).data
+            fast = FastRecipeSerializer(
+                self._recipes().values(*recipe_columns(fields)),
+                many=True,
+                fields=fields,
+                expand=expand
+            ).data
+
+            self.assertEqual(render(fast), render(expected))
+
+    def test_detail_equivalent(self):
+        """ Test a recipe detail renders the same bytes"""
+        recipe = self._recipes().last()
+        expected = RecipeDetailSerializer(recipe).data
+        fast = FastRecipeSerializer(
+            self._recipes().values(*recipe_columns()).get(pk=recipe.pk),
+            expand=('tags', 'ingredient')
+        ).data
+
+        self.assertEqual(render(fast), render(expected))
+
+    def test_endpoints_equivalent(self):
+        """ Test the endpoints respond the same with and without fast reads"""
+        recipe = self._recipes().first()
+        for url, params in (
+            (RECIPE_URL, {}),
+            (RECIPE_URL, {'fields': 'id,tags', 'expand': 'ingredient'}),
+            (RECIPE_URL, {'page_size': 2}),
+            (reverse('recipe:recipe-detail', args=[recipe.id]), {}),
+            (TAG_URL, {}),
+            (TAG_URL, {'with_counts': 1, 'assigned_only': 1}),
+            (INGREDIENT_URL, {'page_size': 1}),
+        ):
+            responses = []
+            for enabled in (False, True):
+                get_detail_cache().clear()
+                with override_settings(RECIPE_FAST_READS={'ENABLED': enabled}):
+                    responses.append(self.client.get(url, params))
+
+            self.assertEqual(responses[1].status_code, status.HTTP_200_OK)
+            self.assertEqual(responses[1].content, responses[0].content)
+
+    def test_list_queries(self):
+        """ Test the fast list runs one query per relation"""
+        # The collection version, the recipes and both relations
+        with self.assertNumQueries(4):
+            self.client.get(RECIPE_URL)
@@ -47,7 +47,7 @@ class PrivateApiIngredient(TestCase):
         ingredients = Ingredient.objects.all().order_by('-name')
         serializer = serializers.IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_ingredients_limited_to_user(self):
         """Test that only ingredients for authenticated user are returned"""
@@ -61,8 +61,8 @@ class PrivateApiIngredient(TestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], ingredients.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], ingredients.name)
 
     def test_create_ingredient_successful(self):
         """ Test if the ingredient object created succesffully"""
@@ -107,8 +107,8 @@ class PrivateApiIngredient(TestCase):
 
         serializer1 = serializers.IngredientSerializer(ingredient1)
         serializer2 = serializers.IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_ingredient_assigned_unique(self):
         """Test filtering ingredients by assigned returns unique items"""
@@ -135,4 +135,42 @@ class PrivateApiIngredient(TestCase):
 
         res = self.client.get(INGREDIENT_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_ingredients_with_counts(self):
+        """Test annotating ingredients with their number of recipes"""
+        apple = Ingredient.objects.create(user=self.user, name='Apple')
+        banana = Ingredient.objects.create(user=self.user, name='Banana')
+        for title in ('Pie', 'Crumble'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minute=30,
+                price=8.00,
+                user=self.user
+            )
+            recipe.ingredient.add(apple)
+
+        res = self.client.get(INGREDIENT_URL, {'with_counts': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'id': banana.id, 'name': 'Banana', 'recipe_count': 0},
+            {'id': apple.id, 'name': 'Apple', 'recipe_count': 2},
+        ])
+
+    def test_resolve_ingredients(self):
+        """Test resolving names to the user's ingredients"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+
+        res = self.client.post(
+            reverse('recipe:ingredient-resolve'),
+            {'names': ['Pepper', 'SALT']},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['name'] for item in res.data],
+            ['Pepper', 'Salt']
+        )
+        self.assertEqual(res.data[1]['id'], salt.id)
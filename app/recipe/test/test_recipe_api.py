@@ -1,15 +1,25 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Tag, Ingredient, Recipe
+from core.models import CollectionVersion, Tag, Ingredient, Recipe
 from .. import serializers
+from ..cache import get_detail_cache
+from .. import imaging
+from ..imaging import RENDITIONS, render_renditions, rendition_name
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
 import tempfile
+import threading
+import time
 import os
 from PIL import Image
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk-create')
 
 
 def image_upload_url(recipe_id):
@@ -71,6 +81,7 @@ class PrivateRecipeApiTest(TestCase):
 
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        get_detail_cache().clear()
 
     def test_retrieve_recipe(self):
         """ Test that retrieve the recipes"""
@@ -84,7 +95,7 @@ class PrivateRecipeApiTest(TestCase):
         serializer = serializers.RecipeSerializer(recipe, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_limited_authenticated(self):
         """ Test retrieving the data for user """
@@ -102,8 +113,8 @@ class PrivateRecipeApiTest(TestCase):
         serializer = serializers.RecipeSerializer(recipe, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_view_recipe_detail(self):
 
@@ -211,6 +222,550 @@ class PrivateRecipeApiTest(TestCase):
         self.assertEqual(len(tags), 0)
 
 
+class RecipeRelatedValidationTest(TestCase):
+    """ Test validating the tag and ingredient ids of a recipe"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'related@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ids_resolved_in_one_query(self):
+        """ Test many ingredient ids are validated with one query"""
+        ingredients = [
+            sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            for i in range(30)
+        ]
+        payload = {
+            'title': 'Stew',
+            'time_minute': 90,
+            'price': '12.00',
+            'ingredient': [ingredient.id for ingredient in ingredients],
+        }
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        lookups = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "core_ingredient" WHERE' in query['sql']
+        ]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(len(res.data['ingredient']), 30)
+
+    def test_unknown_ids_single_error(self):
+        """ Test every unknown id is reported in one error"""
+        tag = sample_tag(user=self.user)
+        payload = {
+            'title': 'Stew',
+            'time_minute': 90,
+            'price': '12.00',
+            'tags': [tag.id, 999998, 999999],
+        }
+
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(res.data['tags']), 1)
+        self.assertIn('999998', res.data['tags'][0])
+        self.assertIn('999999', res.data['tags'][0])
+
+    def test_other_user_ids_rejected(self):
+        """ Test tags of another user cannot be assigned"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        tag = sample_tag(user=other)
+        payload = {
+            'title': 'Stew',
+            'time_minute': 90,
+            'price': '12.00',
+            'tags': [tag.id],
+        }
+
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class RecipeBulkCreateTest(TestCase):
+    """ Test creating and updating many recipes in one request"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bulk@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [
+            sample_tag(user=self.user, name=f'Tag {i}') for i in range(3)
+        ]
+        self.ingredient = sample_ingredient(user=self.user)
+
+    def _payload(self, count):
+        return [
+            {
+                'title': f'Recipe {i}',
+                'time_minute': 10,
+                'price': '5.00',
+                'tags': [tag.id for tag in self.tags],
+                'ingredient': [self.ingredient.id],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create_recipes(self):
+        """ Test recipes and their links are created"""
+        res = self.client.post(BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 3)
+            self.assertEqual(list(recipe.ingredient.all()), [self.ingredient])
+        self.assertEqual(
+            sorted(item['id'] for item in res.data),
+            sorted(recipe.id for recipe in recipes)
+        )
+
+    def test_bulk_create_query_count_is_fixed(self):
+        """ Test the number of queries does not grow with the items"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(BULK_URL, self._payload(2), format='json')
+        few = len(ctx.captured_queries)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(BULK_URL, self._payload(20), format='json')
+        many = len(ctx.captured_queries)
+
+        if connection.features.can_return_rows_from_bulk_insert:
+            self.assertEqual(few, many)
+        # One IN query validates every tag id, one prefetches the response
+        tag_lookups = [
+            query for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "core_tag"' in query['sql']
+        ]
+        self.assertEqual(len(tag_lookups), 2)
+
+    def test_bulk_create_reports_item_errors(self):
+        """ Test invalid items are reported and nothing is created"""
+        payload = self._payload(3)
+        payload[1]['tags'] = [999999]
+        del payload[2]['title']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('tags', res.data[1])
+        self.assertIn('title', res.data[2])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_too_many(self):
+        """ Test the batch size is limited"""
+        payload = self._payload(1) * 1001
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def _recipes(self, count):
+        res = self.client.post(BULK_URL, self._payload(count), format='json')
+        return [item['id'] for item in res.data]
+
+    def test_bulk_update_recipes(self):
+        """ Test recipes and their links are replaced"""
+        ids = self._recipes(2)
+        payload = [
+            {
+                'id': pk,
+                'title': f'Updated {pk}',
+                'time_minute': 20,
+                'price': '7.00',
+                'tags': [self.tags[0].id],
+                'ingredient': [],
+            }
+            for pk in ids
+        ]
+
+        res = self.client.put(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], ids)
+        for recipe in Recipe.objects.filter(id__in=ids):
+            self.assertEqual(recipe.title, f'Updated {recipe.id}')
+            self.assertEqual(recipe.time_minute, 20)
+            self.assertEqual(list(recipe.tags.all()), [self.tags[0]])
+            self.assertFalse(recipe.ingredient.exists())
+        self.assertEqual(res.data[0]['tags'], [self.tags[0].id])
+
+    def test_bulk_partial_update_keeps_links(self):
+        """ Test a partial update leaves the omitted fields alone"""
+        ids = self._recipes(2)
+        payload = [{'id': pk, 'price': '9.50'} for pk in ids]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for recipe in Recipe.objects.filter(id__in=ids):
+            self.assertEqual(str(recipe.price), '9.50')
+            self.assertEqual(recipe.title[:7], 'Recipe ')
+            self.assertEqual(recipe.tags.count(), 3)
+            self.assertEqual(list(recipe.ingredient.all()), [self.ingredient])
+
+    def test_bulk_update_query_count_is_fixed(self):
+        """ Test the number of queries does not grow with the items"""
+        few, many = self._recipes(2), self._recipes(20)
+
+        counts = []
+        for ids in (few, many):
+            payload = [
+                {'id': pk, 'title': 'Renamed', 'tags': [self.tags[1].id]}
+                for pk in ids
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.patch(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_update_reports_unknown_recipes(self):
+        """ Test recipes of other users or named twice are rejected"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        foreign = sample_recipe(user=other)
+        ids = self._recipes(1)
+        payload = [
+            {'id': ids[0], 'title': 'Mine'},
+            {'id': foreign.id, 'title': 'Theirs'},
+            {'id': ids[0], 'title': 'Twice'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        self.assertIn('id', res.data[2])
+        foreign.refresh_from_db()
+        self.assertNotEqual(foreign.title, 'Theirs')
+        self.assertFalse(Recipe.objects.filter(title='Mine').exists())
+
+
+class RecipeFilterMatchTest(TestCase):
+    """ Test the any/all semantics of the recipe filters"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'match@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = sample_tag(user=self.user, name='Vegan')
+        self.dessert = sample_tag(user=self.user, name='Dessert')
+        self.both = sample_recipe(user=self.user, title='Sorbet')
+        self.both.tags.add(self.vegan, self.dessert)
+        self.vegan_only = sample_recipe(user=self.user, title='Salad')
+        self.vegan_only.tags.add(self.vegan)
+
+    def _titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in res.data['results']]
+
+    def test_match_any_returns_each_recipe_once(self):
+        """ Test a recipe matching several tags is not duplicated"""
+        titles = self._titles(
+            {'tags': f'{self.vegan.id},{self.dessert.id}'}
+        )
+
+        self.assertEqual(titles, ['Salad', 'Sorbet'])
+
+    def test_match_all_tags(self):
+        """ Test match=all requires every tag"""
+        titles = self._titles({
+            'tags': f'{self.vegan.id},{self.dessert.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual(titles, ['Sorbet'])
+
+    def test_match_all_tags_and_ingredients(self):
+        """ Test match=all applies to tags and ingredients together"""
+        sugar = sample_ingredient(user=self.user, name='Sugar')
+        lemon = sample_ingredient(user=self.user, name='Lemon')
+        self.both.ingredient.add(sugar, lemon)
+        self.vegan_only.ingredient.add(sugar, lemon)
+
+        titles = self._titles({
+            'tags': f'{self.vegan.id},{self.dessert.id}',
+            'ingredient': f'{sugar.id},{lemon.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual(titles, ['Sorbet'])
+
+    def test_match_all_repeated_id(self):
+        """ Test repeating an id does not change match=all"""
+        titles = self._titles({
+            'tags': f'{self.vegan.id},{self.vegan.id}',
+            'match': 'all'
+        })
+
+        self.assertEqual(titles, ['Salad', 'Sorbet'])
+
+    def test_match_invalid(self):
+        """ Test an unknown match mode is rejected"""
+        res = self.client.get(
+            RECIPE_URL,
+            {'tags': self.vegan.id, 'match': 'some'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeQueryCountTest(TestCase):
+    """ Test that the number of queries does not grow with the recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'queries@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_detail_cache().clear()
+
+    def _create_recipes(self, count):
+        # Names are unique per user, so continue after existing recipes
+        start = Recipe.objects.count()
+        for i in range(start, start + count):
+            recipe = sample_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredient.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_fixed(self):
+        """ Test listing recipes uses one query per relation"""
+        self._create_recipes(2)
+        few = self._count_queries(RECIPE_URL)
+
+        self._create_recipes(10)
+        many = self._count_queries(RECIPE_URL)
+
+        self.assertEqual(few, many)
+        # The collection version, the recipes and one query per relation
+        self.assertEqual(many, 4)
+
+    def test_list_filtered_query_count_is_fixed(self):
+        """ Test filtering recipes does not add queries per recipe"""
+        tag = sample_tag(user=self.user, name='Shared')
+        self._create_recipes(2)
+        for recipe in Recipe.objects.all():
+            recipe.tags.add(tag)
+        few = self._count_queries(f'{RECIPE_URL}?tags={tag.id}')
+
+        self._create_recipes(10)
+        for recipe in Recipe.objects.all():
+            recipe.tags.add(tag)
+        many = self._count_queries(f'{RECIPE_URL}?tags={tag.id}')
+
+        self.assertEqual(few, many)
+
+    def test_retrieve_query_count_is_fixed(self):
+        """ Test the detail view uses one query per nested relation"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user))
+        few = self._count_queries(detail_url(recipe.id))
+
+        get_detail_cache().clear()
+        for i in range(10):
+            recipe.tags.add(sample_tag(user=self.user, name=f'Tag {i}'))
+            recipe.ingredient.add(
+                sample_ingredient(user=self.user, name=f'Ingredient {i}')
+            )
+        get_detail_cache().clear()
+        many = self._count_queries(detail_url(recipe.id))
+
+        self.assertEqual(few, many)
+        # The collection version, the recipe and one query per relation
+        self.assertEqual(many, 4)
+
+
+class RecipeFieldsTest(TestCase):
+    """ Test sparse fieldsets and expanded relations of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'fields@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_detail_cache().clear()
+        self.tag = sample_tag(user=self.user, name='Vegan')
+        self.ingredient = sample_ingredient(user=self.user, name='Kale')
+        self.recipe = sample_recipe(user=self.user, title='Salad')
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredient.add(self.ingredient)
+
+    def _get(self, url, params):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data, ctx.captured_queries
+
+    def test_list_fields(self):
+        """ Test listing only some fields narrows the query"""
+        data, queries = self._get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(
+            data['results'],
+            [{'id': self.recipe.id, 'title': 'Salad'}]
+        )
+        # The collection version and the recipes, no prefetches
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"price"', queries[-1]['sql'])
+
+    def test_list_expand(self):
+        """ Test expanding relations inlines the nested objects"""
+        data, queries = self._get(
+            RECIPE_URL,
+            {'fields': 'title', 'expand': 'tags,ingredient'}
+        )
+
+        self.assertEqual(data['results'], [{
+            'title': 'Salad',
+            'tags': [{'id': self.tag.id, 'name': 'Vegan'}],
+            'ingredient': [{'id': self.ingredient.id, 'name': 'Kale'}],
+        }])
+        self.assertEqual(len(queries), 4)
+
+    def test_list_expand_all_fields(self):
+        """ Test expanding without fields keeps every field"""
+        data, _ = self._get(RECIPE_URL, {'expand': 'tags'})
+
+        item = data['results'][0]
+        detail = serializers.RecipeDetailSerializer(self.recipe).data
+        self.assertEqual(item['tags'], detail['tags'])
+        self.assertEqual(item['ingredient'], [self.ingredient.id])
+        self.assertEqual(set(item), set(detail))
+
+    def test_retrieve_fields(self):
+        """ Test the detail payload can be narrowed too"""
+        data, _ = self._get(detail_url(self.recipe.id), {'fields': 'tags'})
+
+        self.assertEqual(
+            data,
+            {'tags': [{'id': self.tag.id, 'name': 'Vegan'}]}
+        )
+
+    def test_invalid_fields(self):
+        """ Test unknown fields and relations are rejected"""
+        for params in ({'fields': 'id,user'}, {'expand': 'title'}):
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipePaginationTest(TestCase):
+    """ Test cursor pagination of the recipe list"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'pages@gmail.com',
+            'Signup!23'
+            )
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_paginated_by_default(self):
+        """ Test the list is paginated without page_size"""
+        for i in range(51):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 50)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_page_size_capped(self):
+        """ Test page_size cannot exceed max_page_size"""
+        for i in range(101):
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+
+        res = self.client.get(RECIPE_URL, {'page_size': 1000})
+
+        self.assertEqual(len(res.data['results']), 100)
+
+    def test_walk_pages_with_cursor(self):
+        """ Test following the cursor returns every recipe once"""
+        recipes = [
+            sample_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            self.assertLessEqual(len(res.data['results']), 2)
+            ids.extend(item['id'] for item in res.data['results'])
+
+        self.assertEqual(ids, sorted((r.id for r in recipes), reverse=True))
+
+    def test_paginated_filter_by_tags(self):
+        """ Test the tags filter still applies to each page"""
+        tag = sample_tag(user=self.user)
+        for i in range(3):
+            sample_recipe(user=self.user, title=f'Tagged {i}').tags.add(tag)
+        sample_recipe(user=self.user, title='Untagged')
+
+        res = self.client.get(RECIPE_URL, {'tags': tag.id, 'page_size': 2})
+        titles = [item['title'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        titles.extend(item['title'] for item in res.data['results'])
+
+        self.assertIsNone(res.data['next'])
+        self.assertEqual(titles, ['Tagged 2', 'Tagged 1', 'Tagged 0'])
+
+
+@override_settings(RECIPE_IMAGE_PIPELINE={'EXECUTOR': 'sync'})
 class RecipeImageUploadTest(TestCase):
 
     def setUp(self):
@@ -224,6 +779,12 @@ class RecipeImageUploadTest(TestCase):
         self.recipe = sample_recipe(user=self.user)
 
     def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            for key, _, _, _ in RENDITIONS:
+                self.recipe.image.storage.delete(
+                    rendition_name(self.recipe.image.name, key)
+                )
         self.recipe.image.delete()
 
     def test_upload_image_to_recipe(self):
@@ -241,6 +802,60 @@ class RecipeImageUploadTest(TestCase):
         self.assertIn('image', res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_renditions(self):
+        """ Test uploading an image renders resized renditions"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            img = Image.new('RGB', (1600, 1200))
+            img.save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(url, {'image': ntf}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        self.assertEqual(
+            set(res.data['renditions']),
+            {key for key, _, _, _ in RENDITIONS}
+        )
+        for key, size, image_format, _ in RENDITIONS:
+            path = self.recipe.image.storage.path(
+                rendition_name(self.recipe.image.name, key)
+            )
+            with Image.open(path) as rendition:
+                self.assertEqual(rendition.format, image_format)
+                self.assertLessEqual(rendition.width, size[0])
+                self.assertLessEqual(rendition.height, size[1])
+
+    @override_settings(
+        RECIPE_IMAGE_PIPELINE={'EXECUTOR': 'process', 'WORKERS': 1}
+    )
+    def test_upload_image_broken_pool(self):
+        """ Test a pool broken by a dead worker fails the image and is
+        replaced"""
+        pool = imaging._executor('process', 1)
+        with self.assertRaises(BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (10, 10)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            with self.assertLogs('recipe.imaging', 'ERROR'):
+                res = self.client.post(
+                    url, {'image': ntf}, format='multipart'
+                )
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        fresh = imaging._executor('process', 1)
+        self.assertIsNot(fresh, pool)
+        fresh.shutdown()
+        imaging._executor.cache_clear()
+
     def test_upload_image_bad_request(self):
         """ Test uploading an invalid image"""
 
@@ -268,9 +883,9 @@ class RecipeImageUploadTest(TestCase):
         serializer1 = serializers.RecipeSerializer(recipe1)
         serializer2 = serializers.RecipeSerializer(recipe2)
         serializer3 = serializers.RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -292,6 +907,69 @@ class RecipeImageUploadTest(TestCase):
         serializer1 = serializers.RecipeSerializer(recipe1)
         serializer2 = serializers.RecipeSerializer(recipe2)
         serializer3 = serializers.RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+
+@override_settings(RECIPE_IMAGE_PIPELINE={'EXECUTOR': 'thread'})
+class RecipeImageBackgroundTest(TransactionTestCase):
+    """ Test renditions rendered by a pool, the callback runs outside the
+    request on its own connection, so the data has to be committed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'background@gmail.com',
+            'testpass!23'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        for key, _, _, _ in RENDITIONS:
+            self.recipe.image.storage.delete(
+                rendition_name(self.recipe.image.name, key)
+            )
+        self.recipe.image.delete()
+
+    def _wait_for_status(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.recipe.refresh_from_db()
+            if self.recipe.image_status != Recipe.IMAGE_PROCESSING:
+                break
+            time.sleep(0.05)
+        return self.recipe.image_status
+
+    def test_upload_image_thread_pool(self):
+        """ Test the pool marks the image ready and bumps the version"""
+        release = threading.Event()
+
+        def render(*args):
+            release.wait(10)
+            return render_renditions(*args)
+
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf, patch(
+            'recipe.imaging.render_renditions', render
+        ):
+            Image.new('RGB', (1000, 800)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': ntf},
+                format='multipart'
+            )
+            # Held back until the request's own changes are counted
+            self.assertEqual(res.data['image_status'], Recipe.IMAGE_PROCESSING)
+            version = CollectionVersion.current(self.user.pk)
+            release.set()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._wait_for_status(), Recipe.IMAGE_READY)
+        self.assertGreater(CollectionVersion.current(self.user.pk), version)
+        for key, _, _, _ in RENDITIONS:
+            self.assertTrue(self.recipe.image.storage.exists(
+                rendition_name(self.recipe.image.name, key)
+            ))
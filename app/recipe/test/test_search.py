@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+from ..search import clear_search_indexes, get_search_index
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample_recipe(user, title, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minute=10,
+        price=5.00
+    )
+    recipe.tags.add(*Tag.objects.get_or_create_many(user.pk, tags))
+    recipe.ingredient.add(
+        *Ingredient.objects.get_or_create_many(user.pk, ingredients)
+    )
+    return recipe
+
+
+class RecipeSearchTest(TestCase):
+    """ Test the full-text recipe search"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'search@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        clear_search_indexes()
+
+        self.curry = sample_recipe(
+            self.user, 'Thai curry', tags=['Spicy'], ingredients=['Coconut']
+        )
+        self.soup = sample_recipe(
+            self.user, 'Pumpkin soup', tags=['Curry'], ingredients=['Milk']
+        )
+        self.cake = sample_recipe(
+            self.user, 'Carrot cake', ingredients=['Coconut', 'Curry']
+        )
+
+    def _titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['title'] for item in res.data['results']]
+
+    def test_search_ranks_title_tags_ingredients(self):
+        """ Test title matches rank over tag and ingredient matches"""
+        titles = self._titles({'search': 'curry'})
+
+        self.assertEqual(titles, ['Thai curry', 'Pumpkin soup', 'Carrot cake'])
+
+    def test_search_matches_every_word(self):
+        """ Test a recipe must match all words of the search"""
+        self.assertEqual(
+            self._titles({'search': 'Coconut CURRY'}),
+            ['Thai curry', 'Carrot cake']
+        )
+        self.assertEqual(self._titles({'search': 'curry milk'}),
+                         ['Pumpkin soup'])
+        self.assertEqual(self._titles({'search': 'lasagna'}), [])
+
+    def test_search_combines_with_filters(self):
+        """ Test the search applies on top of the tag filter"""
+        spicy = Tag.objects.get(name='Spicy')
+
+        titles = self._titles({'search': 'coconut', 'tags': spicy.id})
+
+        self.assertEqual(titles, ['Thai curry'])
+
+    def test_search_follows_changes(self):
+        """ Test renamed tags and new recipes are searchable at once"""
+        self.assertEqual(self._titles({'search': 'hot'}), [])
+
+        Tag.objects.filter(name='Spicy').update(name='Hot')
+        Tag.objects.get(name='Hot').save()
+        sample_recipe(self.user, 'Hot pot')
+
+        self.assertEqual(
+            self._titles({'search': 'hot'}),
+            ['Hot pot', 'Thai curry']
+        )
+
+    def test_search_limited_to_user(self):
+        """ Test recipes of other users are never found"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        sample_recipe(other, 'Green curry')
+
+        self.assertNotIn('Green curry', self._titles({'search': 'curry'}))
+
+    @override_settings(RECIPE_SEARCH={'MAX_RESULTS': 2})
+    def test_search_capped_single_page(self):
+        """ Test searches return the best matches as a single page"""
+        res = self.client.get(
+            RECIPE_URL,
+            {'search': 'curry', 'page_size': 1}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['next'])
+        self.assertIsNone(res.data['previous'])
+        self.assertEqual(
+            [item['title'] for item in res.data['results']],
+            ['Thai curry', 'Pumpkin soup']
+        )
+
+    @override_settings(RECIPE_SEARCH={'MAX_RESULTS': 1})
+    def test_search_filters_past_best_matches(self):
+        """ Test filtered out top matches leave room for the next ones"""
+        curry = Tag.objects.get(name='Curry')
+
+        titles = self._titles({'search': 'curry', 'tags': curry.id})
+
+        self.assertEqual(titles, ['Pumpkin soup'])
+
+    def test_search_index_intersects_postings(self):
+        """ Test only recipes matching every word are scored"""
+        index = get_search_index(self.user.pk)
+
+        self.assertEqual(set(index.search('coconut curry')), {
+            self.curry.id, self.cake.id
+        })
+        self.assertEqual(index.search('coconut lasagna curry'), {})
+
+    def test_blank_search_ignored(self):
+        """ Test a blank search lists every recipe"""
+        self.assertEqual(len(self._titles({'search': '  '})), 3)
@@ -0,0 +1,200 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe, RecipeStat
+from ..stats import recipe_stats, summary_stats
+
+STATS_URL = reverse('recipe:recipe-stats')
+SUMMARY = {'PRICE_BUCKETS': (5, 10), 'SUMMARY': True}
+
+
+def sample_recipe(user, title, time_minute, price, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minute=time_minute,
+        price=price
+    )
+    recipe.tags.add(*tags)
+    recipe.ingredient.add(*ingredients)
+    return recipe
+
+
+@override_settings(RECIPE_STATS={'PRICE_BUCKETS': (5, 10), 'SUMMARY': False})
+class RecipeStatsTest(TestCase):
+    """ Test the recipe stats endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'stats@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        sample_recipe(self.user, 'Salad', 10, 4.00, [self.vegan, self.quick])
+        sample_recipe(self.user, 'Soup', 30, 6.00, [self.vegan], [self.salt])
+        sample_recipe(self.user, 'Steak', 50, 20.00, [], [self.salt])
+
+    def test_stats(self):
+        """ Test the stats are aggregated in two queries"""
+        with self.assertNumQueries(2):
+            res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipe_count': 3,
+            'time_minute_avg': 30.0,
+            'price_avg': 10.0,
+            'price_histogram': [
+                {'min': None, 'max': 5, 'count': 1},
+                {'min': 5, 'max': 10, 'count': 1},
+                {'min': 10, 'max': None, 'count': 1},
+            ],
+            'tags': [
+                {'id': self.vegan.id, 'name': 'Vegan', 'recipe_count': 2},
+                {'id': self.quick.id, 'name': 'Quick', 'recipe_count': 1},
+            ],
+            'ingredients': [
+                {'id': self.salt.id, 'name': 'Salt', 'recipe_count': 2},
+            ],
+        })
+
+    def test_stats_filtered(self):
+        """ Test the stats accept the recipe list filters"""
+        res = self.client.get(STATS_URL, {'tags': self.vegan.id})
+
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['time_minute_avg'], 20.0)
+        self.assertEqual(res.data['ingredients'][0]['recipe_count'], 1)
+
+    def test_stats_limited_to_user(self):
+        """ Test other users' recipes are not aggregated"""
+        other = get_user_model().objects.create_user(
+            'other@gmail.com',
+            'Signup!23'
+        )
+        sample_recipe(other, 'Cake', 60, 9.00)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 3)
+
+    def test_stats_empty(self):
+        """ Test a user without recipes gets empty stats"""
+        Recipe.objects.all().delete()
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.data['recipe_count'], 0)
+        self.assertIsNone(res.data['price_avg'])
+        self.assertEqual(res.data['tags'], [])
+
+
+@override_settings(RECIPE_STATS=SUMMARY)
+class RecipeStatSummaryTest(TestCase):
+    """ Test the incrementally maintained stats summary"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'summary@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.soup = sample_recipe(
+            self.user, 'Soup', 30, 6.00, [self.vegan], [self.salt]
+        )
+
+    def assertSummaryCurrent(self):
+        self.assertEqual(
+            summary_stats(self.user.pk),
+            recipe_stats(Recipe.objects.filter(user=self.user))
+        )
+
+    def test_summary_built_on_read(self):
+        """ Test the summary is built once, then read in two queries"""
+        self.assertFalse(RecipeStat.objects.exists())
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertTrue(RecipeStat.objects.exists())
+
+        with self.assertNumQueries(2):
+            self.client.get(STATS_URL)
+
+    def test_summary_follows_changes(self):
+        """ Test signals keep the summary equal to the aggregates"""
+        self.client.get(STATS_URL)
+
+        salad = sample_recipe(self.user, 'Salad', 10, 4.00, [self.vegan])
+        self.assertSummaryCurrent()
+
+        salad.price = 12
+        salad.time_minute = 15
+        salad.save()
+        self.assertSummaryCurrent()
+
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        salad.tags.add(quick)
+        quick.recipe_set.add(self.soup)
+        self.soup.ingredient.clear()
+        self.assertSummaryCurrent()
+
+        self.vegan.recipe_set.clear()
+        self.assertSummaryCurrent()
+
+        quick.delete()
+        self.soup.delete()
+        self.assertSummaryCurrent()
+
+        Recipe.objects.get(pk=salad.pk).delete()
+        self.assertSummaryCurrent()
+
+    def test_summary_ignores_removing_unlinked(self):
+        """ Test removing ids that are not linked changes no count"""
+        self.client.get(STATS_URL)
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        pepper = Ingredient.objects.create(user=self.user, name='Pepper')
+
+        self.soup.tags.remove(quick)
+        self.soup.ingredient.remove(pepper, self.salt)
+        self.assertSummaryCurrent()
+        quick.recipe_set.remove(self.soup)
+        self.salt.recipe_set.remove(self.soup)
+        self.assertSummaryCurrent()
+
+        self.soup.tags.add(quick)
+        pepper.recipe_set.add(self.soup)
+        self.assertSummaryCurrent()
+
+    def test_summary_follows_bulk_create(self):
+        """ Test bulk created recipes and links are counted"""
+        self.client.get(STATS_URL)
+
+        with transaction.atomic():
+            Recipe.objects.bulk_create_with_relations(
+                [
+                    Recipe(user=self.user, title='A', time_minute=5, price=2),
+                    Recipe(user=self.user, title='B', time_minute=9, price=8),
+                ],
+                [[self.vegan.id], [self.vegan.id, self.vegan.id]],
+                [[self.salt.id], []]
+            )
+
+        self.assertSummaryCurrent()
+
+    def test_summary_skips_filtered_stats(self):
+        """ Test filtered stats are still aggregated from the recipes"""
+        sample_recipe(self.user, 'Salad', 10, 4.00)
+
+        res = self.client.get(STATS_URL, {'tags': self.vegan.id})
+
+        self.assertEqual(res.data['recipe_count'], 1)
+        self.assertFalse(RecipeStat.objects.exists())
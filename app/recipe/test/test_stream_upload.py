@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+import tracemalloc
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe
+from ..imaging import RENDITIONS, rendition_name
+from ..uploads import UploadTooLarge, stream_image_upload
+
+
+def stream_url(recipe_id):
+
+    return reverse('recipe:recipe-upload-image-stream', args=[recipe_id])
+
+
+def sample_image(size=(10, 10), image_format='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+@override_settings(RECIPE_IMAGE_PIPELINE={'EXECUTOR': 'sync'})
+class StreamImageUploadTest(TestCase):
+    """ Test uploading recipe images as a raw request body"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'stream@gmail.com',
+            'Signup!23'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Toast',
+            time_minute=5,
+            price=2.00
+        )
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            for key, _, _, _ in RENDITIONS:
+                self.recipe.image.storage.delete(
+                    rendition_name(self.recipe.image.name, key)
+                )
+        self.recipe.image.delete()
+
+    def _put(self, body, content_type='application/octet-stream'):
+        return self.client.put(
+            stream_url(self.recipe.id),
+            body,
+            content_type=content_type
+        )
+
+    def test_stream_upload(self):
+        """ Test the body is written to the recipe image path"""
+        body = sample_image(image_format='PNG')
+
+        res = self._put(body, 'image/png')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['sha256'], hashlib.sha256(body).hexdigest())
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(self.recipe.image.name.endswith('.png'))
+        with open(self.recipe.image.path, 'rb') as uploaded:
+            self.assertEqual(uploaded.read(), body)
+
+    def test_stream_upload_not_an_image(self):
+        """ Test a body that is not an image is rejected"""
+        res = self._put(b'not an image' * 100)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.recipe.image)
+
+    def test_stream_upload_empty(self):
+        """ Test a request without a body is rejected"""
+        res = self._put(b'')
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(self.recipe.image)
+
+    def test_stream_upload_invalid_content_length(self):
+        """ Test a non numeric Content-Length is rejected"""
+        res = self.client.generic(
+            'PUT',
+            stream_url(self.recipe.id),
+            sample_image(),
+            content_type='image/jpeg',
+            CONTENT_LENGTH='ten'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_UPLOAD={'MAX_BYTES': 100})
+    def test_stream_upload_too_large(self):
+        """ Test the size limit is enforced from Content-Length"""
+        res = self._put(sample_image(size=(200, 200)))
+
+        self.assertEqual(res.status_code, 413)
+
+    @override_settings(RECIPE_IMAGE_UPLOAD={'MAX_PIXELS': 100})
+    def test_stream_upload_dimensions(self):
+        """ Test the dimensions are checked from the header"""
+        res = self._put(sample_image(size=(20, 20)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(RECIPE_IMAGE_UPLOAD={'MAX_BYTES': 5000})
+    def test_stream_upload_limit_while_reading(self):
+        """ Test the size limit holds without a Content-Length"""
+        body = io.BytesIO(sample_image() + b'\0' * 10000)
+        directory = self.recipe.image.storage.path('uploads/recipe')
+        os.makedirs(directory, exist_ok=True)
+        before = set(os.listdir(directory))
+
+        with self.assertRaises(UploadTooLarge):
+            stream_image_upload(self.recipe, body)
+
+        self.assertEqual(set(os.listdir(directory)), before)
+
+    def test_stream_upload_constant_memory(self):
+        """ Test peak memory does not grow with the upload size"""
+        body = io.BytesIO(sample_image() + b'\0' * (8 * 1024 * 1024))
+
+        tracemalloc.start()
+        try:
+            name, _ = stream_image_upload(self.recipe, body)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.recipe.image.storage.delete(name)
+        self.assertLess(peak, 1024 * 1024)
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -44,7 +46,7 @@ class PrivateTagsApiTest(TestCase):
         tags = Tag.objects.all().order_by('-name')
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tags_limited_to_user(self):
         """ Test that tags returned are for the authenticated users"""
@@ -58,8 +60,8 @@ class PrivateTagsApiTest(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
 
     def test_create_tag_successfuly(self):
         """ Tes if the tags creationg is successful"""
@@ -97,8 +99,8 @@ class PrivateTagsApiTest(TestCase):
 
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertNotIn(serializer2.data, res.data['results'])
 
     def test_retrieve_tags_assigned_unique(self):
         """Test filtering tags by assigned returns unique items"""
@@ -122,4 +124,100 @@ class PrivateTagsApiTest(TestCase):
         recipe2.tags.add(tag)
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
-        self.assertEqual(len(res.data), 1)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_retrieve_assigned_tags_with_counts(self):
+        """ Test counting recipes per tag in a single query"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        for title in ('Pancakes', 'Waffles', 'Omelette'):
+            recipe = Recipe.objects.create(
+                title=title,
+                time_minute=15,
+                price=4.00,
+                user=self.user
+            )
+            recipe.tags.add(tag)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                TAGS_URL,
+                {'assigned_only': 1, 'with_counts': 1}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data['results'],
+            [{'id': tag.id, 'name': 'Breakfast', 'recipe_count': 3}]
+        )
+        tag_queries = [
+            query for query in ctx.captured_queries
+            if 'core_tag' in query['sql']
+        ]
+        self.assertEqual(len(tag_queries), 1)
+
+    def test_paginate_tags_by_name(self):
+        """ Test tags are paginated in name order with a cursor"""
+        for name in ('Breakfast', 'Dinner', 'Lunch'):
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+        names = [item['name'] for item in res.data['results']]
+        res = self.client.get(res.data['next'])
+        names.extend(item['name'] for item in res.data['results'])
+
+        self.assertEqual(names, ['Lunch', 'Dinner', 'Breakfast'])
+        self.assertIsNone(res.data['next'])
+
+    def test_paginate_assigned_only(self):
+        """ Test assigned_only is applied to paginated tags"""
+        tag = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Lunch')
+        recipe = Recipe.objects.create(
+            title='Pancakes',
+            time_minute=15,
+            price=4.00,
+            user=self.user
+        )
+        recipe.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1, 'page_size': 1})
+
+        self.assertEqual(res.data['results'], [TagSerializer(tag).data])
+        self.assertIsNone(res.data['next'])
+
+    def test_create_tag_duplicate(self):
+        """ Test creating a tag the user has under another case fails"""
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(TAGS_URL, {'name': 'vEGAN'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_resolve_tags(self):
+        """ Test resolving names to tags, creating the missing ones"""
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.post(
+            reverse('recipe:tag-resolve'),
+            {'names': ['vegan', 'Brunch', 'BRUNCH']},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        brunch = Tag.objects.get(user=self.user, name='Brunch')
+        self.assertEqual(res.data, [
+            {'id': vegan.id, 'name': 'Vegan'},
+            {'id': brunch.id, 'name': 'Brunch'},
+        ])
+
+    def test_resolve_tags_invalid(self):
+        """ Test resolving requires a list of names"""
+        res = self.client.post(
+            reverse('recipe:tag-resolve'),
+            {'names': []},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,97 @@
+import hashlib
+import io
+import os
+from django.core.files.storage import default_storage
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from core.conf import setting_reader
+from core.models import recipe_image_file_path
+
+CHUNK_SIZE = 64 * 1024
+HEADER_CHUNK_SIZE = 4 * 1024
+
+EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = _('Upload too large.')
+    default_code = 'too_large'
+
+
+_upload_setting = setting_reader('RECIPE_IMAGE_UPLOAD')
+
+
+def _read_header(stream, limit):
+    """ Read the stream until Pillow identifies the image from its header
+
+    Image.open only parses the header, so no pixel data is decoded and
+    at most ``limit`` bytes are buffered.
+    """
+    header = b''
+    while len(header) < limit:
+        chunk = stream.read(min(HEADER_CHUNK_SIZE, limit - len(header)))
+        if not chunk:
+            break
+        header += chunk
+        try:
+            with Image.open(io.BytesIO(header)) as image:
+                return header, image.format, image.size
+        except Image.DecompressionBombError:
+            raise ValidationError(
+                {'image': [_('Image dimensions too large.')]}
+            )
+        except Exception:
+            # Most likely a header cut short, try again with more bytes
+            continue
+
+    raise ValidationError({'image': [_('Upload a valid image.')]})
+
+
+def stream_image_upload(recipe, stream, content_length=None):
+    """ Write an image from a request stream to its final storage path
+
+    The format and dimensions are checked from the first bytes, the size
+    before and while reading, and the body is hashed as it is written in
+    fixed size chunks. Returns the storage name and the SHA-256 digest.
+    """
+    max_bytes = _upload_setting('MAX_BYTES', 20 * 1024 * 1024)
+    if content_length is not None and content_length > max_bytes:
+        raise UploadTooLarge()
+
+    header, image_format, (width, height) = _read_header(
+        stream,
+        _upload_setting('HEADER_BYTES', 64 * 1024)
+    )
+    if image_format not in _upload_setting('FORMATS', tuple(EXTENSIONS)):
+        raise ValidationError({'image': [_('Unsupported image format.')]})
+    if width * height > _upload_setting('MAX_PIXELS', 50000000):
+        raise ValidationError({'image': [_('Image dimensions too large.')]})
+
+    name = recipe_image_file_path(recipe, f'upload.{EXTENSIONS[image_format]}')
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'wb') as destination:
+            chunk = header
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                destination.write(chunk)
+                chunk = stream.read(CHUNK_SIZE)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    digest = digest.hexdigest()
+    if hasattr(default_storage, 'adopt'):
+        # Content-addressed storage dedupes by the hash computed above
+        name = default_storage.adopt(name, digest)
+    return name, digest
@@ -1,42 +1,191 @@
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import viewsets, mixins
 from . import serializers
+from .imaging import process_recipe_image
+from .uploads import stream_image_upload
+from .cache import detail_cache_key, get_detail_cache
+from .pagination import RankedPagination, RecipeAttrCursorPagination, \
+                         RecipeCursorPagination
+from .search import search_recipes
+from .stats import recipe_stats, summary_stats
+from .autocomplete import autocomplete
+from .export import CONTENT_TYPES, csv_stream, ndjson_stream
+from .fastpath import FastNameSerializer, FastRecipeSerializer, \
+                      fast_reads_enabled, recipe_columns
 from rest_framework import status
-from core.models import Tag, Ingredient, Recipe
+from core.instrumentation import InstrumentedViewMixin
+from core.models import CollectionVersion, Tag, Ingredient, Recipe, \
+                        RecipeStat
+from user.authentication import CachedTokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from django.http import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+import hashlib
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class CollectionETagMixin:
+    """ Answer list requests conditionally on the user's collection
+
+    The ETag combines the user's CollectionVersion with the request URL,
+    so a matching If-None-Match gets a 304 after a single primary key
+    lookup, before the list query or the serializer run.
+    """
+
+    def _collection_etag(self, request):
+        version = CollectionVersion.current(request.user.pk)
+        key = f'{request.user.pk}:{request.get_full_path()}'
+        digest = hashlib.md5(key.encode()).hexdigest()[:16]
+        return 'W/' + quote_etag(f'{version}-{digest}')
+
+    def list(self, request, *args, **kwargs):
+        etag = self._collection_etag(request)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = super().list(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+class BaseRecipeAttrViewSet(InstrumentedViewMixin,
+                            CollectionETagMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """ Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipeAttrCursorPagination
+
+    def _param_flag(self, name):
+        """ Return a boolean query parameter sent as 0 or 1"""
+        return bool(int(self.request.query_params.get(name, 0)))
+
+    def _recipe_links(self):
+        """ Return the M2M rows linking the outer object to recipes"""
+        through = getattr(Recipe, self.recipe_relation).through
+        model_name = self.queryset.model._meta.model_name
+        return through.objects.filter(**{model_name: OuterRef('pk')})
+
+    def _autocomplete_params(self):
+        """ Return the prefix and fuzzy query to complete, if any"""
+        if self.action != 'list':
+            return '', ''
+
+        params = self.request.query_params
+        return params.get('prefix', '').strip(), params.get('q', '').strip()
+
+    def _autocomplete_limit(self):
+        limit = self.request.query_params.get('limit')
+        try:
+            return int(limit) if limit else None
+        except ValueError:
+            raise ValidationError({'limit': 'Must be an integer.'})
 
     def get_queryset(self):
         """ Return object for authenticated users only"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._param_flag('assigned_only'):
+            # A correlated EXISTS probes the through table index once per
+            # row instead of joining and de-duplicating every link
+            queryset = queryset.filter(Exists(self._recipe_links()))
+        if self._param_flag('with_counts'):
+            model_name = self.queryset.model._meta.model_name
+            counts = self._recipe_links().filter(
+                recipe__user=self.request.user
+            ).order_by().values(model_name).annotate(
+                count=Count('pk')
+            ).values('count')
+            queryset = queryset.annotate(
+                recipe_count=Coalesce(Subquery(counts), 0)
+            )
+
+        prefix, query = self._autocomplete_params()
+        if prefix or query:
+            # The in-memory index only knows names, not links or counts
+            return autocomplete(
+                queryset,
+                self.request.user.pk,
+                prefix=prefix,
+                query=query,
+                limit=self._autocomplete_limit(),
+                use_index=not (
+                    self._param_flag('assigned_only') or
+                    self._param_flag('with_counts')
+                )
+            )
+        queryset = queryset.order_by('-name')
+        if self._fast_read():
+            return queryset.values(*self.get_serializer_class().Meta.fields)
+        return queryset
+
+    def _fast_read(self):
+        """ Whether the list is rendered from values() rows"""
+        return (
+            self.action == 'list' and fast_reads_enabled() and
+            not any(self._autocomplete_params())
         )
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
-            user=self.request.user
-            ).order_by('-name').distinct()
+
+    def get_serializer(self, *args, **kwargs):
+        """ Render values() rows with FastNameSerializer"""
+        if args and self._fast_read():
+            return FastNameSerializer(*args, **kwargs)
+
+        return super().get_serializer(*args, **kwargs)
+
+    @property
+    def paginator(self):
+        """ Send autocompletion, which is ranked and capped, as one page"""
+        if any(self._autocomplete_params()):
+            return RankedPagination()
+
+        return super().paginator
+
+    def get_serializer_class(self):
+        """ Return the counting serializer when counts are requested"""
+        if self.action == 'list' and self._param_flag('with_counts'):
+            return self.count_serializer_class
+
+        return self.serializer_class
 
     def perform_create(self, serializer):
         """ Create a new object"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='resolve')
+    def resolve(self, request):
+        """ Return the objects with the given names, creating missing ones"""
+        names = serializers.NameListSerializer(data=request.data)
+        if not names.is_valid():
+            return Response(
+                names.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        objects = self.queryset.model.objects.get_or_create_many(
+            request.user.pk,
+            names.validated_data['names']
+        )
+        serializer = self.serializer_class(objects, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """ Manage tags in the datebase """
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_relation = 'tags'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -44,48 +193,285 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
+    recipe_relation = 'ingredient'
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(InstrumentedViewMixin,
+                    CollectionETagMixin,
+                    viewsets.ModelViewSet):
     """ Manage recipe in the database """
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated, )
+    pagination_class = RecipeCursorPagination
+    MATCH_MODES = ('any', 'all')
 
     def _params_to_ints(self, qs):
         """ Convert a list of string IDs to a list of integers"""
 
         return [int(str_qs) for str_qs in qs.split(',')]
 
+    def _filter_related(self, queryset, relation, ids, match):
+        """ Filter recipes linked to any or all of the given ids"""
+        through = getattr(Recipe, relation).through
+        column = getattr(Recipe, relation).field.m2m_reverse_field_name()
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if match == 'all':
+            # One grouped scan of the through table: a recipe matches when
+            # it is linked to every requested id
+            matching = links.order_by().values('recipe').annotate(
+                matched=Count('pk')
+            ).filter(matched=len(set(ids))).values('recipe')
+            return queryset.filter(pk__in=matching)
+
+        # EXISTS yields each recipe once however many ids it matches
+        return queryset.filter(Exists(links.filter(recipe=OuterRef('pk'))))
+
     def get_queryset(self):
 
         """ Retrieve objects only for authenticated """
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredient')
+        match = self.request.query_params.get('match', 'any')
+        if match not in self.MATCH_MODES:
+            raise ValidationError(
+                {'match': f'Must be one of: {", ".join(self.MATCH_MODES)}'}
+            )
+
         queryset = self.queryset
         if tags:
             tags_id = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_id)
+            queryset = self._filter_related(queryset, 'tags', tags_id, match)
         if ingredients:
             ingredients_id = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredient__id__in=ingredients_id)
+            queryset = self._filter_related(
+                queryset, 'ingredient', ingredients_id, match
+            )
+
+        queryset = queryset.filter(user=self.request.user).order_by('-id')
+        fields, _ = self._projection()
+        if self.action == 'list' and fields is not None:
+            # Relations are prefetched, only columns can be deferred
+            queryset = queryset.only(*recipe_columns(fields))
+        search = self._search_query()
+        if search:
+            queryset = search_recipes(queryset, self.request.user.pk, search)
+        if self._fast_read():
+            # The detail cache holds full payloads, only lists are narrowed
+            return queryset.values(*recipe_columns(
+                fields if self.action == 'list' else None
+            ))
+        return queryset.prefetch_related(*self._get_prefetches())
+
+    def _fast_read(self):
+        """ Whether recipes are rendered from values() rows"""
+        return self.action in ('list', 'retrieve') and fast_reads_enabled()
+
+    def _search_query(self):
+        """ Return the full-text search of a list request, if any"""
+        if self.action != 'list':
+            return ''
+
+        return self.request.query_params.get('search', '').strip()
+
+    @property
+    def paginator(self):
+        """ Send searches, which are ranked and capped, as one page"""
+        if self._search_query():
+            return RankedPagination()
+
+        return super().paginator
+
+    def _param_list(self, name):
+        value = self.request.query_params.get(name, '')
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def _projection(self):
+        """ Return the fields, or None for all, and the relations to
+        expand that the request asked for"""
+        if self.action not in ('list', 'retrieve'):
+            return None, ()
+
+        fields = self._param_list('fields')
+        expand = self._param_list('expand') if self.action == 'list' else []
+        errors = {}
+        unknown = set(fields) - set(serializers.RecipeSerializer.Meta.fields)
+        if unknown:
+            errors['fields'] = f'Unknown fields: {", ".join(sorted(unknown))}'
+        unknown = set(expand) - set(serializers.EXPANDABLE)
+        if unknown:
+            errors['expand'] = (
+                f'Must be among: {", ".join(serializers.EXPANDABLE)}'
+            )
+        if errors:
+            raise ValidationError(errors)
+
+        if not fields:
+            return None, tuple(expand)
+        # Expanding a relation implies returning it
+        return tuple(dict.fromkeys(fields + expand)), tuple(expand)
+
+    def _get_prefetches(self):
+        """ Return the relations each action serializes, one query each,
+        sorted by id like FastRecipeSerializer"""
+        if self.action == 'list':
+            fields, expand = self._projection()
+        elif self.action == 'retrieve':
+            fields, expand = None, tuple(serializers.EXPANDABLE)
+        else:
+            return ()
 
-        return queryset.filter(user=self.request.user)
+        prefetches = []
+        for name, model in (('tags', Tag), ('ingredient', Ingredient)):
+            if fields is not None and name not in fields:
+                continue
+            related = model.objects.order_by('id')
+            if name not in expand:
+                # Only primary keys are rendered, skip the other columns
+                related = related.only('id')
+            prefetches.append(Prefetch(name, queryset=related))
+        return prefetches
+
+    def get_serializer(self, *args, **kwargs):
+        """ Project listed recipes on the requested fields, rendering
+        values() rows with FastRecipeSerializer"""
+        if self.action == 'list':
+            kwargs['fields'], kwargs['expand'] = self._projection()
+        if args and self._fast_read():
+            if self.action == 'retrieve':
+                kwargs['expand'] = tuple(serializers.EXPANDABLE)
+            return FastRecipeSerializer(*args, **kwargs)
+
+        return super().get_serializer(*args, **kwargs)
 
     def get_serializer_class(self):
         """ Return appropriate serializer class"""
         if self.action == 'retrieve':
             return serializers.RecipeDetailSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ('upload_image', 'upload_image_stream'):
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        """ Return a recipe, serving the payload from the detail cache"""
+        fields, _ = self._projection()
+        cache = get_detail_cache()
+        key = detail_cache_key(
+            request.user.pk,
+            kwargs[self.lookup_url_kwarg or self.lookup_field],
+            CollectionVersion.current(request.user.pk)
+        )
+        data = cache.get(key)
+        if data is None:
+            serializer = self.get_serializer(self.get_object())
+            data = dict(serializer.data)
+            cache.set(key, data)
+
+        if fields is not None:
+            # The cache holds full payloads, project them afterwards
+            data = {name: data[name] for name in fields}
+        return Response(data)
+
     def perform_create(self, serializer):
         """ Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk_create(self, request):
+        """ Create many recipes in a single transaction"""
+        serializer = self.get_serializer(data=request.data, many=True)
+
+        if serializer.is_valid():
+            serializer.save(user=request.user)
+            return Response(
+                serializer.data,
+                status=status.HTTP_201_CREATED
+            )
+
+        return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    @bulk_create.mapping.put
+    def bulk_update(self, request):
+        """ Update many recipes, named by id, in a single transaction"""
+        return self._bulk_update(request, partial=False)
+
+    @bulk_create.mapping.patch
+    def bulk_partial_update(self, request):
+        """ Partially update many recipes in a single transaction"""
+        return self._bulk_update(request, partial=True)
+
+    def _bulk_update(self, request, partial):
+        ids = []
+        if isinstance(request.data, list):
+            ids = [
+                item.get('id') for item in request.data
+                if isinstance(item, dict)
+            ]
+        recipes = self.get_queryset().filter(
+            id__in=[pk for pk in ids if str(pk).isdigit()]
+        )
+        serializer = self.get_serializer(
+            list(recipes),
+            data=request.data,
+            many=True,
+            partial=partial
+        )
+
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    def perform_content_negotiation(self, request, force=False):
+        """ Accept any Accept header on exports, which stream their own
+        content type"""
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'export'
+        )
+
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """ Stream all the recipes, optionally filtered, as NDJSON or CSV"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in CONTENT_TYPES:
+            raise ValidationError(
+                {'output': f'Must be one of: {", ".join(CONTENT_TYPES)}'}
+            )
+
+        stream = ndjson_stream if output == 'ndjson' else csv_stream
+        # export_chunks reads values() rows and looks relations up itself,
+        # prefetches would be applied to every chunk of dicts
+        response = StreamingHttpResponse(
+            stream(self.get_queryset().prefetch_related(None)),
+            content_type=CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{output}"'
+        )
+        return response
+
+    @action(methods=['GET'], detail=False, url_path='stats')
+    def stats(self, request):
+        """ Return aggregates of the recipes, optionally filtered"""
+        params = request.query_params
+        if RecipeStat.enabled() and not (
+            params.get('tags') or params.get('ingredient')
+        ):
+            return Response(summary_stats(request.user.pk))
+
+        return Response(recipe_stats(self.get_queryset()))
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
         """ Upload an image to recipe """
@@ -96,7 +482,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            # The stored file and its reference are committed together
+            with transaction.atomic():
+                serializer.save(image_status=Recipe.IMAGE_PROCESSING)
+            process_recipe_image(serializer.instance)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
@@ -106,3 +495,32 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+    @action(methods=['PUT'], detail=True, url_path='upload-image/stream')
+    def upload_image_stream(self, request, pk=None):
+        """ Upload an image sent as the raw request body """
+        recipe = self.get_object()
+        content_length = request.META.get('CONTENT_LENGTH')
+        try:
+            content_length = int(content_length) if content_length else None
+        except ValueError:
+            raise ValidationError({'image': ['Invalid Content-Length.']})
+        # DRF has no stream for requests without a body
+        if request.stream is None:
+            raise ValidationError({'image': ['No image was sent.']})
+
+        with transaction.atomic():
+            name, digest = stream_image_upload(
+                recipe,
+                request.stream,
+                content_length
+            )
+
+            recipe.image.name = name
+            recipe.image_status = Recipe.IMAGE_PROCESSING
+            recipe.save(update_fields=['image', 'image_status'])
+        process_recipe_image(recipe)
+
+        data = dict(self.get_serializer(recipe).data)
+        data['sha256'] = digest
+        return Response(data, status=status.HTTP_200_OK)
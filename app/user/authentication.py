@@ -0,0 +1,108 @@
+import copy
+import uuid
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from core.cache import LRUCache
+from core.conf import setting_reader
+
+
+_cache_setting = setting_reader('TOKEN_AUTH_CACHE')
+
+
+def _shared_cache():
+    """ Return the Django cache shared between processes, if configured"""
+    alias = _cache_setting('SHARED_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return f'auth-token:{key}'
+
+
+def _generation_key(key):
+    return f'auth-token-generation:{key}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """ Token authentication caching the token -> user lookup
+
+    Lookups are kept in a per-process LRU and, when ``SHARED_CACHE`` names
+    a Django cache, in that cache too. Deleting the token or saving the
+    user drops the entry from this process and the shared cache, and
+    replaces the token's generation in the shared cache. Local entries
+    are only trusted while the shared generation still matches the one
+    they were loaded under, so every process sees invalidations at once.
+
+    Without a shared cache other processes only notice after their local
+    entry expires, so ``TTL`` bounds how long a deleted token or an
+    inactive user keeps authenticating there and is kept to seconds.
+    """
+    local_cache = LRUCache(
+        maxsize=_cache_setting('MAX_SIZE', 10000),
+        ttl=_cache_setting('TTL', 5)
+    )
+
+    def authenticate_credentials(self, key):
+        entry = self.local_cache.get(key)
+        shared = _shared_cache()
+        if shared is not None:
+            # One round trip for the generation and, on a miss, the entry
+            keys = [_generation_key(key)]
+            if entry is None:
+                keys.append(_shared_key(key))
+            found = shared.get_many(keys)
+            generation = found.get(_generation_key(key))
+            if entry is not None and entry[2] != generation:
+                entry = None
+            if entry is None:
+                entry = found.get(_shared_key(key))
+            if entry is not None and entry[2] != generation:
+                entry = None
+            if entry is not None:
+                self.local_cache.set(key, entry)
+        else:
+            generation = None
+
+        if entry is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            # The generation was read before the token, an invalidation
+            # in between leaves this entry mismatched
+            entry = (token.user, token, generation)
+            self.local_cache.set(key, entry)
+            if shared is not None:
+                shared.set(
+                    _shared_key(key),
+                    entry,
+                    _cache_setting('SHARED_TTL', 300)
+                )
+
+        user, token = entry[:2]
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        # Views may modify request.user, never hand out the cached instance
+        return (copy.copy(user), token)
+
+
+def invalidate_token(key):
+    """ Drop a token from this process and the shared cache, and expire
+    it in the other processes' local caches"""
+    CachedTokenAuthentication.local_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None:
+        # Outlives every local entry, which a missing generation expires
+        shared.set(
+            _generation_key(key),
+            uuid.uuid4().hex,
+            max(_cache_setting('SHARED_TTL', 300), _cache_setting('TTL', 5))
+        )
+        shared.delete(_shared_key(key))
@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import CachedTokenAuthentication
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """ Test the cached token authentication backend"""
+
+    def setUp(self):
+        CachedTokenAuthentication.local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='cache@ravenours.com',
+            password='Signup!23',
+            name='Cache'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ME_URL)
+
+        return res, len(ctx.captured_queries)
+
+    def test_token_lookup_is_cached(self):
+        """ Test the token is only looked up on the first request"""
+        res, first = self._count_queries()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res, second = self._count_queries()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(first, 1)
+        self.assertEqual(second, 0)
+
+    def test_invalid_token(self):
+        """ Test an unknown token is rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_invalidated(self):
+        """ Test a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user_invalidated(self):
+        """ Test deactivating a cached user stops authenticating"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_user_invalidated(self):
+        """ Test updating the user through the API reloads it"""
+        self.client.get(ME_URL)
+        res = self.client.patch(
+            ME_URL,
+            {'name': 'New name', 'password': 'Newpass!23'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res, queries = self._count_queries()
+
+        self.assertEqual(res.data['name'], 'New name')
+        self.assertEqual(queries, 1)
+
+
+@override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+class SharedTokenInvalidationTest(TestCase):
+    """ Test invalidations reach the local caches of other processes"""
+
+    def setUp(self):
+        CachedTokenAuthentication.local_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='shared@ravenours.com',
+            password='Signup!23'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.client.get(ME_URL)
+        # What another process still holds after the invalidation
+        self.stale = CachedTokenAuthentication.local_cache.get(
+            self.token.key
+        )
+
+    def _stale_request(self):
+        CachedTokenAuthentication.local_cache.set(self.token.key, self.stale)
+        return self.client.get(ME_URL)
+
+    def test_deleted_token(self):
+        """ Test a stale local entry of a deleted token is not trusted"""
+        self.token.delete()
+
+        res = self._stale_request()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_inactive_user(self):
+        """ Test a stale local entry of a deactivated user is not trusted"""
+        self.user.is_active = False
+        self.user.save()
+
+        res = self._stale_request()
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_valid_entry_trusted(self):
+        """ Test an unchanged token is served from the local cache"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 0)